@@ -2,19 +2,29 @@
 Hybrid Brain Worker - Python FastAPI Service
 Maneja el procesamiento pesado: descarga y transcripción.
 """
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, validator
-from typing import Optional, List
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import iterate_in_threadpool
+from pydantic import BaseModel, AnyHttpUrl, AfterValidator
+from typing import Optional, List, Iterator, AsyncIterator, Tuple, Annotated
 from enum import Enum
+from contextlib import contextmanager
+import asyncio
+import json
 import logging
+import threading
 import time
-import requests
+import httpx
+import orjson
 import os
+from pathlib import Path
+from urllib.parse import urlsplit
 
 from app.services.youtube_downloader import YoutubeDownloader
-from app.services.whisper_transcriber import WhisperTranscriber, TranscriptionResult
-from app.services.youtube_transcript_service import YoutubeTranscriptService
+from app.services.youtube_url import ParsedYtUrl
+from app.services.whisper_transcriber import WhisperTranscriber, TranscriptionResult, count_words
+from app.services.youtube_transcript_service import get_transcript_service
 
 # Configurar logging
 logging.basicConfig(
@@ -27,23 +37,128 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Hybrid Brain Worker",
     description="Servicio de procesamiento multimedia: descarga y transcripción",
-    version="1.1.0"
+    version="1.1.0",
+    default_response_class=ORJSONResponse
 )
 
 # Inicializar servicios (lazy loading para Whisper)
 youtube_downloader = YoutubeDownloader()
-youtube_transcript_service = YoutubeTranscriptService()
+youtube_transcript_service = get_transcript_service()
 whisper_transcriber: Optional[WhisperTranscriber] = None
 
+# Protege la creación/reemplazo del transcriptor y cuenta las transcripciones en curso
+_transcriber_lock = threading.Lock()
+_transcriber_idle = threading.Condition(_transcriber_lock)
+_active_transcriptions = 0
+_last_transcription_at = time.monotonic()
 
-def get_transcriber() -> WhisperTranscriber:
-    """Obtiene el transcriptor, inicializándolo si es necesario."""
+
+def _ensure_transcriber_locked() -> WhisperTranscriber:
+    """Crea y carga el transcriptor si no existe. Requiere tener `_transcriber_lock`."""
     global whisper_transcriber
     if whisper_transcriber is None:
-        whisper_transcriber = WhisperTranscriber()
+        transcriber = WhisperTranscriber()
+        transcriber._load_model()
+        whisper_transcriber = transcriber
     return whisper_transcriber
 
 
+def get_transcriber() -> WhisperTranscriber:
+    """Obtiene el transcriptor, cargando el modelo una sola vez por proceso."""
+    transcriber = whisper_transcriber
+    if transcriber is not None:
+        return transcriber
+    with _transcriber_lock:
+        return _ensure_transcriber_locked()
+
+
+@contextmanager
+def use_transcriber() -> Iterator[WhisperTranscriber]:
+    """
+    Reserva el transcriptor mientras dura una transcripción.
+    /model/load y /model/unload esperan a que no haya transcripciones activas.
+    """
+    global _active_transcriptions, _last_transcription_at
+    with _transcriber_lock:
+        transcriber = _ensure_transcriber_locked()
+        _active_transcriptions += 1
+    try:
+        yield transcriber
+    finally:
+        with _transcriber_lock:
+            _active_transcriptions -= 1
+            _last_transcription_at = time.monotonic()
+            if _active_transcriptions == 0:
+                _transcriber_idle.notify_all()
+
+
+# Back-pressure: un solo proceso (WEB_CONCURRENCY=1) con un único modelo en memoria;
+# las transcripciones que superan el límite esperan en cola en vez de agotar la RAM
+MAX_INFLIGHT = int(os.getenv('MAX_INFLIGHT', '16'))
+_inflight = asyncio.Semaphore(MAX_INFLIGHT)
+_waiting_transcriptions = 0
+
+
+async def _acquire_transcription_slot() -> None:
+    """Espera un hueco libre entre las transcripciones en curso."""
+    global _waiting_transcriptions
+    _waiting_transcriptions += 1
+    try:
+        await _inflight.acquire()
+    finally:
+        _waiting_transcriptions -= 1
+
+
+class _StreamSlot:
+    """
+    Hueco de transcripción (y audio descargado) de una respuesta en streaming.
+    Se libera una sola vez: al terminar el stream o desde la tarea de fondo de la
+    respuesta. Si el cliente se desconecta antes de que empiece el body, Starlette
+    cancela el envío sin arrancar el generador y su `finally` nunca se ejecuta.
+    """
+    
+    def __init__(self, audio_path: str):
+        self.audio_path = audio_path
+        self._released = False
+    
+    async def release(self) -> None:
+        # async: BackgroundTask lo ejecuta en el event loop (asyncio.Semaphore no es thread-safe)
+        if self._released:
+            return
+        self._released = True
+        youtube_downloader.cleanup(self.audio_path)
+        _inflight.release()
+
+
+async def _release_slot_after(chunks: Iterator[bytes], slot: _StreamSlot) -> AsyncIterator[bytes]:
+    """Mantiene ocupado el hueco de transcripción hasta que termina el stream."""
+    try:
+        async for chunk in iterate_in_threadpool(chunks):
+            yield chunk
+    finally:
+        # Cierra el generador si quedó a medias (libera el transcriptor) antes de soltar el hueco
+        chunks.close()
+        await slot.release()
+
+
+def _transcribe_with_whisper(
+    audio_path: str,
+    language: Optional[str],
+    include_timestamps: bool
+) -> Tuple[TranscriptionResult, str]:
+    """
+    Transcribe con el modelo compartido y retorna (resultado, nombre del modelo).
+    Es bloqueante: llamar con `asyncio.to_thread` desde los endpoints async.
+    """
+    with use_transcriber() as transcriber:
+        transcription = transcriber.transcribe(
+            audio_path=audio_path,
+            language=language,
+            include_timestamps=include_timestamps
+        )
+        return transcription, transcription.model_name
+
+
 # ================== Modelos Pydantic ==================
 
 class Platform(str, Enum):
@@ -52,18 +167,33 @@ class Platform(str, Enum):
     AUTO = "auto"
 
 
+# Hosts reconocidos para la detección automática de plataforma
+_YOUTUBE_HOSTS = frozenset({
+    'youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com', 'youtu.be'
+})
+_INSTAGRAM_HOSTS = frozenset({'instagram.com', 'www.instagram.com'})
+
+
+def _detect_platform(url: str) -> Optional[Platform]:
+    """Detecta la plataforma por el host de la URL (no por subcadenas del path)."""
+    host = (urlsplit(url).hostname or '').lower()
+    if host in _YOUTUBE_HOSTS:
+        return Platform.YOUTUBE
+    if host in _INSTAGRAM_HOSTS:
+        return Platform.INSTAGRAM
+    return None
+
+
+# URL http(s) validada en pydantic-core (Rust); se expone como str a los servicios
+HttpUrlStr = Annotated[AnyHttpUrl, AfterValidator(str)]
+
+
 class TranscribeRequest(BaseModel):
     """Request para transcribir contenido multimedia."""
-    url: str
+    url: HttpUrlStr
     platform: Platform = Platform.AUTO
     language: Optional[str] = None  # None = auto-detect
     include_timestamps: bool = True
-    
-    @validator('url')
-    def validate_url(cls, v):
-        if not v.startswith(('http://', 'https://')):
-            raise ValueError('URL debe comenzar con http:// o https://')
-        return v
 
 
 class TranscribeResponse(BaseModel):
@@ -94,12 +224,107 @@ class VideoInfoResponse(BaseModel):
     thumbnail: Optional[str]
 
 
+class LoadModelRequest(BaseModel):
+    """Request para pre-cargar un modelo de Whisper."""
+    model_name: Optional[str] = None
+    compute_type: Optional[str] = None  # None = según dispositivo
+
+
 class HealthResponse(BaseModel):
     """Response del health check."""
     status: str
     service: str
     whisper_loaded: bool
     whisper_model: str
+    transcriptions_waiting: int = 0
+
+
+def _transcribe_payload(
+    transcription: TranscriptionResult,
+    video_info: dict,
+    include_timestamps: bool,
+    processing_time: float,
+    method: str
+) -> dict:
+    """
+    Construye el cuerpo de `TranscribeResponse` como dict plano.
+    Se serializa directamente con orjson, sin re-validar miles de segmentos con pydantic.
+    Los segmentos son dataclasses que orjson serializa de forma nativa (sin un dict por segmento).
+    """
+    return {
+        'success': True,
+        'text': transcription.text,
+        'segments': transcription.segments if include_timestamps else None,
+        'language': transcription.language,
+        'duration': transcription.duration,
+        'word_count': count_words(transcription.text),
+        'video_info': video_info,
+        'processing_time': round(processing_time, 2),
+        'method': method,
+    }
+
+
+# Respuesta progresiva de /transcribe: una línea JSON por segmento + una línea final
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _ndjson_line(kind: str, data: dict) -> bytes:
+    """Serializa una línea NDJSON con su tipo ('segment', 'result' o 'error')."""
+    return orjson.dumps({'type': kind, **data}) + b"\n"
+
+
+def _ndjson_from_payload(payload: dict) -> Iterator[bytes]:
+    """Emite como NDJSON un resultado ya completo (ej: transcripción nativa)."""
+    segments = payload['segments'] or []
+    for seg in segments:
+        yield _ndjson_line('segment', seg.to_dict())
+    yield _ndjson_line('result', {**payload, 'segments': None})
+
+
+def _ndjson_whisper_stream(
+    audio_path: str,
+    language: Optional[str],
+    include_timestamps: bool,
+    video_info: dict,
+    start_time: float
+) -> Iterator[bytes]:
+    """
+    Transcribe con Whisper emitiendo cada segmento en cuanto se decodifica.
+    La última línea es el resultado sin segmentos. Elimina el audio al terminar.
+    Starlette consume este generador en su threadpool.
+    """
+    try:
+        with use_transcriber() as transcriber:
+            segments_iter, info, model_name = transcriber.iter_segments(audio_path, language=language)
+            
+            text_parts = []
+            for seg in segments_iter:
+                text_parts.append(seg.text)
+                if include_timestamps:
+                    yield _ndjson_line('segment', seg.to_dict())
+            
+            result = TranscriptionResult(
+                text=" ".join(text_parts),
+                segments=[],
+                language=info.language,
+                duration=info.duration,
+                model_name=model_name
+            )
+            processing_time = time.time() - start_time
+            logger.info("✅ Transcripción completada en %.2fs", processing_time)
+            
+            yield _ndjson_line('result', _transcribe_payload(
+                result,
+                video_info,
+                include_timestamps=False,
+                processing_time=processing_time,
+                method=f"whisper-{model_name}"
+            ))
+    except Exception as e:
+        logger.exception("Error durante transcripción en streaming: %s", e)
+        yield _ndjson_line('error', {'detail': str(e)})
+    finally:
+        youtube_downloader.cleanup(audio_path)
 
 
 # ================== Endpoints ==================
@@ -113,14 +338,14 @@ def health_check():
         "status": "ok",
         "service": "worker-py",
         "whisper_loaded": whisper_transcriber is not None and whisper_transcriber.is_model_loaded(),
-        "whisper_model": WhisperTranscriber.DEFAULT_MODEL
+        "whisper_model": WhisperTranscriber.DEFAULT_MODEL,
+        "transcriptions_waiting": _waiting_transcriptions
     }
 
 
-@app.post("/transcribe", response_model=TranscribeResponse)
-def transcribe_endpoint(request: TranscribeRequest):
+async def _do_transcribe(request: TranscribeRequest, platform: Platform, stream: bool):
     """
-    Endpoint principal: descarga y transcribe contenido multimedia.
+    Lógica común de /transcribe y /transcribe/youtube.
     
     Flujo optimizado:
     1. Detecta la plataforma (YouTube/Instagram)
@@ -128,48 +353,57 @@ def transcribe_endpoint(request: TranscribeRequest):
     3. Si no hay nativa, descarga audio y transcribe con Whisper
     4. Limpia archivos temporales
     5. Retorna transcripción
+    
+    Las llamadas bloqueantes (red, descarga, Whisper) se ejecutan en hilos
+    para no bloquear el event loop.
+    
+    Con `stream=True` la respuesta es NDJSON progresivo: una línea
+    `{"type": "segment", ...}` por segmento y una línea final `{"type": "result", ...}`.
     """
     start_time = time.time()
     
-    logger.info(f"📥 Nueva solicitud de transcripción: {request.url}")
+    logger.info("📥 Nueva solicitud de transcripción: %s", request.url)
     
     # Detectar plataforma
-    platform = request.platform
     if platform == Platform.AUTO:
-        if 'youtube.com' in request.url or 'youtu.be' in request.url:
-            platform = Platform.YOUTUBE
-        elif 'instagram.com' in request.url:
-            platform = Platform.INSTAGRAM
-        else:
+        platform = _detect_platform(request.url)
+        if platform is None:
             raise HTTPException(
                 status_code=400,
                 detail="No se pudo detectar la plataforma. Especifica 'youtube' o 'instagram'."
             )
     
     audio_path = None
+    await _acquire_transcription_slot()
+    release_slot = True
     
     try:
         # === YouTube: Intentar transcripción nativa primero ===
         if platform == Platform.YOUTUBE:
             # Definir idiomas preferidos
             preferred_langs = [request.language] if request.language else ['es', 'en', 'es-419', 'en-US']
+            parsed = ParsedYtUrl.parse(request.url)
+            video_id = parsed.video_id
             
             # Intentar obtener transcripción nativa
             logger.info("🔍 Buscando transcripción nativa de YouTube...")
-            native_transcript = youtube_transcript_service.get_transcript(
-                request.url, 
-                languages=preferred_langs
+            # El servicio cachea en memoria y en disco por (video_id, idiomas)
+            native_transcript = await asyncio.to_thread(
+                youtube_transcript_service.get_transcript,
+                parsed.url,
+                preferred_langs,
+                parsed
             )
             
             if native_transcript:
                 logger.info("✅ Transcripción nativa OBTENIDA de YouTube")
                 
                 # Obtener info del video (versión segura que no falla)
-                video_info = youtube_downloader.get_video_info_safe(request.url)
+                video_info = await asyncio.to_thread(youtube_downloader.get_video_info_safe, parsed.url, parsed)
                 
                 if not video_info:
                     # Fallback mínimo si todo falla
-                    video_id = youtube_transcript_service.extract_video_id(request.url) or "unknown"
+                    video_id = video_id or "unknown"
                     video_info = {
                         'id': video_id,
                         'title': 'YouTube Video (Info Unavailable)',
@@ -181,24 +415,27 @@ def transcribe_endpoint(request: TranscribeRequest):
                 
                 processing_time = time.time() - start_time
                 
-                return TranscribeResponse(
-                    success=True,
-                    text=native_transcript.text,
-                    segments=[seg.to_dict() for seg in native_transcript.segments] if request.include_timestamps else None,
-                    language=native_transcript.language,
-                    duration=native_transcript.duration,
-                    word_count=len(native_transcript.text.split()),
-                    video_info=video_info,
-                    processing_time=round(processing_time, 2),
+                payload = _transcribe_payload(
+                    native_transcript,
+                    video_info,
+                    include_timestamps=request.include_timestamps,
+                    processing_time=processing_time,
                     method="youtube-native"
                 )
+                if stream:
+                    return StreamingResponse(_ndjson_from_payload(payload), media_type=NDJSON_MEDIA_TYPE)
+                return ORJSONResponse(payload)
             
             logger.info("⚠️ No hay transcripción nativa. Usando Whisper...")
         
         # === Fallback: Descargar audio y transcribir con Whisper ===
         if platform == Platform.YOUTUBE:
             logger.info("📥 Descargando audio de YouTube...")
-            download_result = youtube_downloader.download_audio(request.url)
+            download_result = await asyncio.to_thread(
+                youtube_downloader.download_audio,
+                request.url,
+                parsed
+            )
             audio_path = download_result['file_path']
             video_info = download_result['video_info']
             
@@ -211,80 +448,115 @@ def transcribe_endpoint(request: TranscribeRequest):
         
         # === Transcribir con Whisper ===
         logger.info("🎙️ Iniciando transcripción con Whisper...")
-        transcriber = get_transcriber()
         
-        transcription: TranscriptionResult = transcriber.transcribe(
-            audio_path=audio_path,
-            language=request.language,
-            include_timestamps=request.include_timestamps
+        if stream:
+            # El hueco y el audio se liberan al terminar el stream o, si nunca empieza
+            # (cliente desconectado), en la tarea de fondo de la respuesta
+            slot = _StreamSlot(audio_path)
+            response = StreamingResponse(
+                _release_slot_after(_ndjson_whisper_stream(
+                    audio_path,
+                    request.language,
+                    request.include_timestamps,
+                    video_info,
+                    start_time
+                ), slot),
+                media_type=NDJSON_MEDIA_TYPE,
+                background=BackgroundTask(slot.release)
+            )
+            audio_path = None
+            release_slot = False
+            return response
+        
+        transcription, model_name = await asyncio.to_thread(
+            _transcribe_with_whisper,
+            audio_path,
+            request.language,
+            request.include_timestamps
         )
         
         processing_time = time.time() - start_time
         
-        logger.info(f"✅ Transcripción completada en {processing_time:.2f}s")
+        logger.info("✅ Transcripción completada en %.2fs", processing_time)
         
         # Construir respuesta
-        response = TranscribeResponse(
-            success=True,
-            text=transcription.text,
-            segments=[seg.to_dict() for seg in transcription.segments] if request.include_timestamps else None,
-            language=transcription.language,
-            duration=transcription.duration,
-            word_count=len(transcription.text.split()),
-            video_info=video_info,
-            processing_time=round(processing_time, 2),
-            method=f"whisper-{transcriber.model_name}"
-        )
-        
-        return response
+        return ORJSONResponse(_transcribe_payload(
+            transcription,
+            video_info,
+            include_timestamps=request.include_timestamps,
+            processing_time=processing_time,
+            method=f"whisper-{model_name}"
+        ))
         
+    except HTTPException:
+        raise
+    
     except ValueError as e:
-        logger.error(f"Error de validación: {e}")
+        logger.error("Error de validación: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
     
     except FileNotFoundError as e:
-        logger.error(f"Archivo no encontrado: {e}")
+        logger.error("Archivo no encontrado: %s", e)
         raise HTTPException(status_code=404, detail=str(e))
     
     except RuntimeError as e:
-        logger.error(f"Error de procesamiento: {e}")
+        logger.error("Error de procesamiento: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
     
     except Exception as e:
-        logger.exception(f"Error inesperado: {e}")
+        logger.exception("Error inesperado: %s", e)
         raise HTTPException(status_code=500, detail=f"Error inesperado: {str(e)}")
     
     finally:
         # === Limpiar archivos temporales ===
         if audio_path:
             youtube_downloader.cleanup(audio_path)
+        if release_slot:
+            _inflight.release()
+
+
+def _wants_ndjson(accept: Optional[str]) -> bool:
+    """Indica si el cliente pidió la respuesta progresiva en NDJSON."""
+    return accept is not None and NDJSON_MEDIA_TYPE in accept
+
+
+@app.post("/transcribe", response_model=TranscribeResponse)
+async def transcribe_endpoint(request: TranscribeRequest, accept: Optional[str] = Header(None)):
+    """
+    Endpoint principal: descarga y transcribe contenido multimedia.
+    Detecta la plataforma si `platform=auto`.
+    
+    Con `Accept: application/x-ndjson` la respuesta es progresiva: una línea
+    `{"type": "segment", ...}` por segmento y una línea final `{"type": "result", ...}`.
+    """
+    return await _do_transcribe(request, request.platform, _wants_ndjson(accept))
 
 
 @app.post("/transcribe/youtube", response_model=TranscribeResponse)
-async def transcribe_youtube(request: TranscribeRequest):
+async def transcribe_youtube(request: TranscribeRequest, accept: Optional[str] = Header(None)):
     """
     Endpoint específico para YouTube.
-    Wrapper sobre /transcribe con platform=youtube.
+    Igual que /transcribe con platform=youtube.
     """
-    request.platform = Platform.YOUTUBE
-    return transcribe_endpoint(request)
+    return await _do_transcribe(request, Platform.YOUTUBE, _wants_ndjson(accept))
 
 
 @app.post("/video/info", response_model=VideoInfoResponse)
-def get_video_info(request: VideoInfoRequest):
+async def get_video_info(request: VideoInfoRequest):
     """
     Obtiene información de un video sin descargarlo.
     Útil para preview antes de procesar.
     """
     try:
-        if not youtube_downloader.validate_url(request.url):
+        parsed = ParsedYtUrl.parse(request.url)
+        if not parsed.is_valid:
             raise HTTPException(
                 status_code=400,
                 detail="URL no válida de YouTube"
             )
         
-        # Usar versión segura que no falla
-        info = youtube_downloader.get_video_info_safe(request.url)
+        # Usar versión segura que no falla (cacheada por video ID)
+        info = await asyncio.to_thread(youtube_downloader.get_video_info_safe, parsed.url, parsed)
         
         if not info:
             raise HTTPException(
@@ -299,47 +571,71 @@ def get_video_info(request: VideoInfoRequest):
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.exception(f"Error obteniendo info: {e}")
+        logger.exception("Error obteniendo info: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/model/load")
-async def load_whisper_model(model_name: Optional[str] = None):
+def load_whisper_model(request: Optional[LoadModelRequest] = None):
     """
     Pre-carga el modelo de Whisper en memoria.
     Útil para reducir latencia en la primera transcripción.
+    Espera a que terminen las transcripciones en curso antes de reemplazarlo.
     """
     global whisper_transcriber
     
+    request = request or LoadModelRequest()
+    
     try:
-        model = model_name or WhisperTranscriber.DEFAULT_MODEL
-        logger.info(f"🧠 Pre-cargando modelo Whisper: {model}")
+        model = request.model_name or WhisperTranscriber.DEFAULT_MODEL
+        logger.info("🧠 Pre-cargando modelo Whisper: %s", model)
         
-        whisper_transcriber = WhisperTranscriber(model_name=model)
-        whisper_transcriber._load_model()
+        with _transcriber_lock:
+            if (
+                whisper_transcriber is None
+                or whisper_transcriber.model_name != model
+                or (request.compute_type and whisper_transcriber.compute_type != request.compute_type)
+            ):
+                _transcriber_idle.wait_for(lambda: _active_transcriptions == 0)
+                
+                transcriber = WhisperTranscriber(model_name=model, compute_type=request.compute_type)
+                transcriber._load_model()
+                
+                if whisper_transcriber is not None:
+                    whisper_transcriber.unload_model()
+                whisper_transcriber = transcriber
+            else:
+                whisper_transcriber._load_model()
+            
+            device = whisper_transcriber.device
+            compute_type = whisper_transcriber.compute_type
         
         return {
             "status": "ok",
             "message": f"Modelo '{model}' cargado exitosamente",
-            "device": whisper_transcriber.device
+            "device": device,
+            "compute_type": compute_type
         }
         
     except Exception as e:
-        logger.exception(f"Error cargando modelo: {e}")
+        logger.exception("Error cargando modelo: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/model/unload")
-async def unload_whisper_model():
+def unload_whisper_model():
     """
     Descarga el modelo de Whisper de memoria para liberar recursos.
+    Espera a que terminen las transcripciones en curso.
     """
     global whisper_transcriber
     
-    if whisper_transcriber:
-        whisper_transcriber.unload_model()
-        whisper_transcriber = None
-        return {"status": "ok", "message": "Modelo descargado de memoria"}
+    with _transcriber_lock:
+        if whisper_transcriber:
+            _transcriber_idle.wait_for(lambda: _active_transcriptions == 0)
+            whisper_transcriber.unload_model()
+            whisper_transcriber = None
+            return {"status": "ok", "message": "Modelo descargado de memoria"}
     
     return {"status": "ok", "message": "No había modelo cargado"}
 
@@ -350,10 +646,13 @@ async def cleanup_temp_files(max_age_hours: int = 24):
     Limpia archivos temporales antiguos.
     """
     try:
-        deleted = youtube_downloader.cleanup_old_files(max_age_hours)
+        # Recorren directorios enteros: fuera del event loop
+        deleted = await asyncio.to_thread(youtube_downloader.cleanup_old_files, max_age_hours)
+        deleted_cache = await asyncio.to_thread(youtube_transcript_service.cleanup_disk_cache)
         return {
             "status": "ok",
             "deleted_files": deleted,
+            "deleted_cache_files": deleted_cache,
             "max_age_hours": max_age_hours
         }
     except Exception as e:
@@ -362,34 +661,183 @@ async def cleanup_temp_files(max_age_hours: int = 24):
 
 # ================== Eventos de Lifecycle ==================
 
-@app.on_event("startup")
-async def startup_event():
-    """Evento de inicio de la aplicación."""
-    logger.info("🧠 Hybrid Brain Worker iniciado")
-    logger.info(f"📁 Directorio de descargas: {youtube_downloader.output_dir}")
+# Última configuración recibida del API (permite arrancar sin esperar la red)
+SETTINGS_CACHE_FILE = Path(os.getenv('SETTINGS_CACHE_FILE', '/tmp/worker_settings.json'))
+SETTINGS_ETAG_FILE = SETTINGS_CACHE_FILE.with_suffix('.etag')
+
+_settings_task: Optional[asyncio.Task] = None
+_preload_task: Optional[asyncio.Task] = None
+_idle_unload_task: Optional[asyncio.Task] = None
+
+# El modelo queda cargado entre requests (pesos y memoria de GPU calientes);
+# solo se descarga tras este tiempo sin transcripciones. 0 = nunca.
+WHISPER_IDLE_UNLOAD_SECONDS = int(os.getenv('WHISPER_IDLE_UNLOAD_SECONDS', '0'))
+
+
+def _apply_settings(data: dict) -> None:
+    """Aplica la respuesta de `/settings` del API a los servicios."""
+    if not data.get('success'):
+        return
+    
+    settings = {s['key']: s['value'] for s in data.get('settings', [])}
     
-    # Cargar configuraciones dinámicas
+    # Actualizar Whisper DEFAULT_MODEL
+    default_model = settings.get('transcription.default_model')
+    if default_model:
+        WhisperTranscriber.DEFAULT_MODEL = default_model
+        logger.info("✅ Configuración actualizada: Whisper DEFAULT_MODEL = %s", default_model)
+    
+    # Actualizar Whisper DEFAULT_COMPUTE_TYPE
+    compute_type = settings.get('transcription.compute_type')
+    if compute_type:
+        WhisperTranscriber.DEFAULT_COMPUTE_TYPE = compute_type
+        logger.info("✅ Configuración actualizada: Whisper DEFAULT_COMPUTE_TYPE = %s", compute_type)
+
+
+def _load_cached_settings() -> bool:
+    """Aplica la configuración guardada en disco, si existe."""
+    try:
+        data = json.loads(SETTINGS_CACHE_FILE.read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        logger.warning("⚠️ Caché de configuración inválida: %s", e)
+        return False
+    
+    _apply_settings(data)
+    return True
+
+
+async def _refresh_settings() -> None:
+    """
+    Descarga la configuración del API y la guarda en disco.
+    Envía el ETag previo para que el API pueda responder 304 si no hubo cambios.
+    """
     try:
         api_url = os.getenv('API_URL', 'http://api-bun:3000')
-        logger.info(f"Fetching settings from {api_url}/settings...")
+        logger.info("Fetching settings from %s/settings...", api_url)
+        
+        headers = {}
+        if SETTINGS_CACHE_FILE.exists() and SETTINGS_ETAG_FILE.exists():
+            headers['If-None-Match'] = SETTINGS_ETAG_FILE.read_text(encoding='utf-8').strip()
         
-        # Timeout corto para no bloquear demasiado el inicio si el API no está lista
-        response = requests.get(f"{api_url}/settings", timeout=2)
+        response = await app.state.http.get(f"{api_url}/settings", headers=headers)
+        
+        if response.status_code == 304:
+            logger.info("Configuración sin cambios (304)")
+            return
         
         if response.status_code == 200:
             data = response.json()
-            if data.get('success'):
-                settings = {s['key']: s['value'] for s in data.get('settings', [])}
-                
-                # Actualizar Whisper DEFAULT_MODEL
-                default_model = settings.get('transcription.default_model')
-                if default_model:
-                    WhisperTranscriber.DEFAULT_MODEL = default_model
-                    logger.info(f"✅ Configuración actualizada: Whisper DEFAULT_MODEL = {default_model}")
+            _apply_settings(data)
+            
+            SETTINGS_CACHE_FILE.write_text(response.text, encoding='utf-8')
+            etag = response.headers.get('ETag')
+            if etag:
+                SETTINGS_ETAG_FILE.write_text(etag, encoding='utf-8')
+            else:
+                SETTINGS_ETAG_FILE.unlink(missing_ok=True)
                     
     except Exception as e:
-        logger.warning(f"⚠️ No se pudieron cargar configuraciones del API: {e}")
-        logger.warning("Usando valores por defecto.")
+        logger.warning("⚠️ No se pudieron cargar configuraciones del API: %s", e)
+        logger.warning("Usando configuración en caché o valores por defecto.")
+
+
+async def _preload_whisper() -> None:
+    """
+    Carga el modelo de Whisper en segundo plano para que la primera
+    transcripción no pague el tiempo de carga. Espera a la configuración del
+    API para cargar el modelo correcto; las requests que lleguen antes se
+    bloquean en el mismo lock y reutilizan esta carga.
+    """
+    if _settings_task is not None:
+        await _settings_task
+    try:
+        transcriber = await asyncio.to_thread(get_transcriber)
+        logger.info("🧠 Modelo Whisper precargado: %s", transcriber.model_name)
+    except Exception as e:
+        logger.warning("⚠️ No se pudo precargar el modelo Whisper: %s", e)
+
+
+# Descargar el audio a RAM (tmpfs) evita escribirlo y releerlo de disco antes de Whisper
+RAMDISK_DIR = Path("/dev/shm")
+
+
+def _use_ramdisk_for_downloads() -> None:
+    """
+    Descarga en /dev/shm si existe. El espacio libre se comprueba en cada descarga
+    (YoutubeDownloader vuelve al disco cuando no cabe otro archivo máximo).
+    """
+    if os.getenv('DOWNLOADS_IN_RAM', '1') != '1' or not RAMDISK_DIR.is_dir():
+        return
+    try:
+        youtube_downloader.set_ram_dir(RAMDISK_DIR / "hybrid-brain-downloads")
+    except OSError as e:
+        logger.warning("⚠️ No se pudo usar /dev/shm para descargas: %s", e)
+
+
+def _unload_if_idle() -> bool:
+    """Descarga el modelo si lleva WHISPER_IDLE_UNLOAD_SECONDS sin usarse."""
+    global whisper_transcriber
+    
+    with _transcriber_lock:
+        idle_for = time.monotonic() - _last_transcription_at
+        if (
+            whisper_transcriber is None
+            or _active_transcriptions > 0
+            or idle_for < WHISPER_IDLE_UNLOAD_SECONDS
+        ):
+            return False
+        whisper_transcriber.unload_model()
+        whisper_transcriber = None
+    
+    logger.info("💤 Modelo Whisper descargado tras %.0fs sin uso", idle_for)
+    return True
+
+
+async def _idle_unload_loop() -> None:
+    """Revisa periódicamente si el modelo quedó inactivo."""
+    interval = min(60, WHISPER_IDLE_UNLOAD_SECONDS)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(_unload_if_idle)
+        except Exception as e:
+            logger.warning("⚠️ Error descargando modelo inactivo: %s", e)
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Evento de inicio de la aplicación."""
+    global _settings_task, _preload_task, _idle_unload_task
+    
+    logger.info("🧠 Hybrid Brain Worker iniciado")
+    _use_ramdisk_for_downloads()
+    logger.info("📁 Directorio de descargas: %s", youtube_downloader.output_dir)
+    
+    # Cliente HTTP compartido (pool de conexiones keep-alive para llamadas al API)
+    app.state.http = httpx.AsyncClient(
+        timeout=2.0,
+        limits=httpx.Limits(max_keepalive_connections=20)
+    )
+    
+    # Cargar configuraciones dinámicas: primero la caché local (instantáneo),
+    # luego el API en segundo plano para no retrasar el arranque
+    if _load_cached_settings():
+        logger.info("📄 Configuración cargada desde caché: %s", SETTINGS_CACHE_FILE)
+    _settings_task = asyncio.create_task(_refresh_settings())
+    
+    # Precalentar DNS + TLS con YouTube para la primera transcripción nativa
+    asyncio.get_running_loop().run_in_executor(None, youtube_transcript_service.warm_up)
+    # Barrer la caché de transcripciones en disco (expiradas / por encima del tamaño máximo)
+    asyncio.get_running_loop().run_in_executor(None, youtube_transcript_service.cleanup_disk_cache)
+    
+    # Precargar Whisper (desactivar con WHISPER_PRELOAD=0 para ahorrar memoria)
+    if os.getenv('WHISPER_PRELOAD', '1') == '1':
+        _preload_task = asyncio.create_task(_preload_whisper())
+    
+    if WHISPER_IDLE_UNLOAD_SECONDS > 0:
+        _idle_unload_task = asyncio.create_task(_idle_unload_loop())
 
 
 @app.on_event("shutdown")
@@ -397,11 +845,19 @@ async def shutdown_event():
     """Evento de cierre de la aplicación."""
     logger.info("Cerrando Hybrid Brain Worker...")
     
+    # Cerrar conexiones del cliente HTTP compartido
+    if _settings_task and not _settings_task.done():
+        _settings_task.cancel()
+    if _idle_unload_task:
+        _idle_unload_task.cancel()
+    await app.state.http.aclose()
+    
     # Liberar modelo de memoria
     if whisper_transcriber:
         whisper_transcriber.unload_model()
     
-    # Limpiar archivos temporales
+    # Cerrar instancias de yt-dlp y limpiar archivos temporales
+    youtube_downloader.close()
     youtube_downloader.cleanup_old_files(max_age_hours=0)
     
     logger.info("Worker cerrado correctamente")
@@ -1,5 +1,13 @@
 # Services module
-from .youtube_downloader import YoutubeDownloader
-from .whisper_transcriber import WhisperTranscriber
-
+# Exports diferidos (PEP 562): importar un submódulo no arrastra yt-dlp ni faster-whisper
 __all__ = ['YoutubeDownloader', 'WhisperTranscriber']
+
+
+def __getattr__(name):
+    if name == 'YoutubeDownloader':
+        from .youtube_downloader import YoutubeDownloader
+        return YoutubeDownloader
+    if name == 'WhisperTranscriber':
+        from .whisper_transcriber import WhisperTranscriber
+        return WhisperTranscriber
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
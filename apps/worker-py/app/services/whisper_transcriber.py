@@ -2,11 +2,32 @@
 Whisper Transcriber Service
 Utiliza faster-whisper para transcribir audio a texto de forma eficiente.
 """
+import asyncio
+import io
 import os
+import queue
+import re
 import logging
+import threading
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterator, AsyncIterator, Tuple, Union, Callable, TYPE_CHECKING
 from dataclasses import dataclass
+from functools import lru_cache
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Audio aceptado: ruta a archivo o muestras float32 mono a 16 kHz ya decodificadas
+AudioInput = Union[str, "np.ndarray"]
+
+# Hilos de OpenMP/BLAS repartidos entre los procesos de uvicorn para no sobresuscribir
+# la CPU. Debe fijarse antes de importar ctranslate2/numpy (se importan de forma lazy).
+_CPU_THREADS_PER_PROCESS = max(1, (os.cpu_count() or 1) // max(1, int(os.getenv("WEB_CONCURRENCY", "1"))))
+for _var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+    os.environ.setdefault(_var, str(_CPU_THREADS_PER_PROCESS))
+
+# Réplicas del modelo en CTranslate2: permiten transcribir en paralelo desde varios hilos
+NUM_WORKERS = max(1, int(os.getenv("WHISPER_NUM_WORKERS", "2")))
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -14,30 +35,78 @@ logger = logging.getLogger(__name__)
 
 # Directorio para modelos de Whisper
 MODELS_DIR = Path("/root/.cache/huggingface")
+# Modelos convertidos a CTranslate2 int8 en el build de la imagen (ver Dockerfile)
+BUNDLED_MODELS_DIR = Path(os.getenv("WHISPER_BUNDLED_MODELS_DIR", "/models"))
+
+# Flash attention de CTranslate2 en GPUs que la soportan (Ampere o superior)
+FLASH_ATTENTION = os.getenv("WHISPER_FLASH_ATTENTION", "1") == "1"
+
+# Silencio mínimo (ms) para que el VAD corte entre tramos de voz
+VAD_MIN_SILENCE_MS = int(os.getenv("WHISPER_VAD_MIN_SILENCE_MS", "500"))
+
+# Chunks de 30s que se pasan juntos por el encoder (1 = decodificación secuencial)
+BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))
+
+# Segmentos decodificados que pueden esperar a un consumidor lento en transcribe_stream
+STREAM_MAX_PENDING = 32
+
+_WORD_RE = re.compile(r'\S+')
+_STREAM_END = object()
+
+
+def count_words(text: str) -> int:
+    """Cuenta palabras sin materializar la lista de `text.split()`."""
+    return sum(1 for _ in _WORD_RE.finditer(text))
+
+
+@lru_cache(maxsize=1)
+def _cuda_compute_types() -> frozenset:
+    """
+    Compute types que CTranslate2 soporta en la GPU 0 (vacío si no hay CUDA).
+    Se consulta a ctranslate2 y no a torch, que no está instalado en la imagen.
+    """
+    try:
+        import ctranslate2
+        if ctranslate2.get_cuda_device_count() == 0:
+            return frozenset()
+        return frozenset(ctranslate2.get_supported_compute_types("cuda"))
+    except Exception:
+        return frozenset()
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class TranscriptionSegment:
-    """Representa un segmento de la transcripción con timestamps."""
+    """
+    Representa un segmento de la transcripción con timestamps.
+    Se normaliza una sola vez al construirse, así orjson puede serializarlo directamente.
+    Con slots no hay un __dict__ por instancia (miles de segmentos en audios largos).
+    """
     start: float
     end: float
     text: str
     
+    def __post_init__(self):
+        object.__setattr__(self, 'start', round(self.start, 2))
+        object.__setattr__(self, 'end', round(self.end, 2))
+        object.__setattr__(self, 'text', self.text.strip())
+    
     def to_dict(self) -> Dict[str, Any]:
         return {
-            'start': round(self.start, 2),
-            'end': round(self.end, 2),
-            'text': self.text.strip()
+            'start': self.start,
+            'end': self.end,
+            'text': self.text
         }
 
 
-@dataclass 
+@dataclass(slots=True, frozen=True)
 class TranscriptionResult:
     """Resultado completo de una transcripción."""
     text: str
     segments: List[TranscriptionSegment]
     language: str
     duration: float
+    # Modelo Whisper que la generó (el concreto si se pidió 'auto'); None si no es de Whisper
+    model_name: Optional[str] = None
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -45,10 +114,104 @@ class TranscriptionResult:
             'segments': [seg.to_dict() for seg in self.segments],
             'language': self.language,
             'duration': round(self.duration, 2),
-            'word_count': len(self.text.split())
+            'word_count': count_words(self.text)
         }
 
 
+# Modelos compartidos por proceso: (modelo, device, compute_type) -> [WhisperModel, referencias]
+# Cada WhisperTranscriber que usa un modelo cuenta una referencia (ej: 'small' y 'auto'
+# comparten 'small'); se olvida cuando la última lo suelta
+_shared_models: Dict[Tuple[str, str, str], List[Any]] = {}
+_shared_models_lock = threading.Lock()
+
+
+# Distil-Whisper: mismo encoder, 2 capas de decoder (decodificación mucho más barata)
+MODEL_ALIASES = {
+    'distil-small.en': 'Systran/faster-distil-whisper-small.en',
+    'distil-medium.en': 'Systran/faster-distil-whisper-medium.en',
+    'distil-large-v3': 'Systran/faster-distil-whisper-large-v3',
+}
+
+# model_name='auto': distil para inglés, multilingüe para el resto
+AUTO_MODEL = 'auto'
+AUTO_MODEL_ENGLISH = os.getenv("WHISPER_AUTO_MODEL_EN", "distil-small.en")
+AUTO_MODEL_FALLBACK = os.getenv("WHISPER_AUTO_MODEL", "small")
+
+
+def _bundled_model_path(model_name: str) -> Optional[Path]:
+    """Ruta del modelo int8 incluido en la imagen, si existe."""
+    path = BUNDLED_MODELS_DIR / f"whisper-{model_name}-int8"
+    return path if (path / "model.bin").is_file() else None
+
+
+def _get_shared_model(model_name: str, device: str, compute_type: str):
+    """
+    Retorna el WhisperModel de esta configuración, cargándolo una sola vez por proceso.
+    Todas las instancias de WhisperTranscriber comparten los mismos pesos en memoria.
+    Suma una referencia: liberarla con _release_shared_model.
+    """
+    key = (model_name, device, compute_type)
+    with _shared_models_lock:
+        entry = _shared_models.get(key)
+        if entry is not None:
+            entry[1] += 1
+            return entry[0]
+        
+        logger.info(f"Cargando modelo Whisper '{model_name}' ({device}, {compute_type})...")
+        
+        from faster_whisper import WhisperModel
+        
+        model_kwargs = dict(
+            device=device,
+            compute_type=compute_type,
+            # Cada réplica usa su parte de los hilos de OMP_NUM_THREADS
+            cpu_threads=max(1, int(os.environ["OMP_NUM_THREADS"]) // NUM_WORKERS),
+            num_workers=NUM_WORKERS,
+        )
+        # bfloat16 solo se soporta desde Ampere (sm 8.x), el mismo mínimo que flash attention
+        if device == "cuda" and FLASH_ATTENTION and "bfloat16" in _cuda_compute_types():
+            model_kwargs['flash_attention'] = True
+        
+        bundled_path = _bundled_model_path(model_name)
+        if bundled_path is not None:
+            # Pesos ya cuantizados en disco: sin consultar ni descargar de Hugging Face
+            model = WhisperModel(str(bundled_path), local_files_only=True, **model_kwargs)
+            _shared_models[key] = [model, 1]
+            logger.info(f"Modelo cargado exitosamente desde {bundled_path}")
+            return model
+        
+        model_kwargs['download_root'] = str(MODELS_DIR)
+        model_id = MODEL_ALIASES.get(model_name, model_name)
+        
+        # Modelos no incluidos en la imagen: primero desde la caché local (volumen
+        # persistente) para no consultar Hugging Face en cada arranque.
+        # Solo se descarga si aún no existe.
+        try:
+            model = WhisperModel(model_id, local_files_only=True, **model_kwargs)
+        except Exception as cache_error:
+            logger.info(f"Modelo no encontrado en caché local ({cache_error}), descargando...")
+            model = WhisperModel(model_id, **model_kwargs)
+        
+        _shared_models[key] = [model, 1]
+        logger.info("Modelo cargado exitosamente")
+        return model
+
+
+def _release_shared_model(model_name: str, device: str, compute_type: str) -> None:
+    """
+    Suelta una referencia al modelo compartido. Con la última se olvida del registro y su
+    memoria se libera al soltar los objetos; si otro transcriptor aún lo usa, se conserva.
+    """
+    key = (model_name, device, compute_type)
+    with _shared_models_lock:
+        entry = _shared_models.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del _shared_models[key]
+
+
 class WhisperTranscriber:
     """
     Servicio para transcribir audio usando faster-whisper.
@@ -56,139 +219,297 @@ class WhisperTranscriber:
     """
     
     # Modelos disponibles ordenados por tamaño/calidad
-    AVAILABLE_MODELS = ['tiny', 'base', 'small', 'medium', 'large-v2', 'large-v3']
+    AVAILABLE_MODELS = [
+        'tiny', 'base', 'small', 'medium', 'large-v2', 'large-v3',
+        'distil-small.en', 'distil-medium.en', 'distil-large-v3', AUTO_MODEL,
+    ]
     DEFAULT_MODEL = 'small'  # Balance óptimo velocidad/calidad
+    # Permiten fijar GPU/int8 en despliegues de producción sin tocar la configuración del API
+    DEFAULT_DEVICE = os.getenv("WHISPER_DEVICE", "auto")
+    DEFAULT_COMPUTE_TYPE: Optional[str] = os.getenv("WHISPER_COMPUTE_TYPE") or None  # None = según dispositivo
     
-    def __init__(self, model_name: Optional[str] = None, device: str = "auto"):
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        device: Optional[str] = None,
+        compute_type: Optional[str] = None
+    ):
         """
         Inicializa el transcriptor.
         
         Args:
-            model_name: Nombre del modelo Whisper a usar
-            device: 'cuda', 'cpu', o 'auto' para detección automática
+            model_name: Nombre del modelo Whisper a usar ('auto' elige distil para inglés)
+            device: 'cuda', 'cpu', o 'auto' para detección automática.
+                None para usar DEFAULT_DEVICE (env WHISPER_DEVICE).
+            compute_type: Tipo de cómputo de CTranslate2 (ej: 'int8', 'int8_float16').
+                None para elegirlo según el dispositivo.
         """
         self.model_name = model_name or self.DEFAULT_MODEL
-        self.device = self._detect_device(device)
-        self.compute_type = self._get_compute_type()
+        self.device = self._detect_device(device or self.DEFAULT_DEVICE)
+        self.compute_type = compute_type or self.DEFAULT_COMPUTE_TYPE or self._get_compute_type()
+        self.batch_size = BATCH_SIZE
         self._model = None
+        self._pipeline = None
+        # Modelos cargados por nombre -> (modelo, pipeline); 'auto' puede usar dos
+        self._loaded: Dict[str, Tuple[Any, Any]] = {}
         
-        logger.info(f"WhisperTranscriber inicializado: modelo={self.model_name}, device={self.device}")
+        logger.info(
+            f"WhisperTranscriber inicializado: modelo={self.model_name}, "
+            f"device={self.device}, compute_type={self.compute_type}"
+        )
     
     def _detect_device(self, device: str) -> str:
         """Detecta automáticamente el dispositivo disponible."""
         if device != "auto":
             return device
         
-        try:
-            import torch
-            if torch.cuda.is_available():
-                logger.info("CUDA disponible, usando GPU")
-                return "cuda"
-        except ImportError:
-            pass
+        if _cuda_compute_types():
+            logger.info("CUDA disponible, usando GPU")
+            return "cuda"
         
         logger.info("Usando CPU para transcripción")
         return "cpu"
     
     def _get_compute_type(self) -> str:
-        """Determina el tipo de cómputo óptimo según el dispositivo."""
+        """Determina el tipo de cómputo óptimo según el dispositivo y sus capacidades."""
         if self.device == "cuda":
-            return "float16"  # Más rápido en GPU
-        return "int8"  # Más eficiente en CPU
+            supported = _cuda_compute_types() or {"int8_float16"}  # GPU no consultable: default
+            # Pesos int8 + activaciones fp16: menos memoria, mismo WER.
+            # Sin tensor cores fp16 (sm < 7.0) CTranslate2 solo ofrece int8 puro.
+            for compute_type in ("int8_float16", "int8", "float16"):
+                if compute_type in supported:
+                    return compute_type
+            return "float32"
+        
+        # En CPU int8 == int8_float32 para CTranslate2; oneDNN elige los kernels VNNI solo
+        return "int8"
     
-    def _load_model(self):
-        """Carga el modelo de Whisper (lazy loading)."""
-        if self._model is None:
-            logger.info(f"Cargando modelo Whisper '{self.model_name}'...")
-            
+    def _pick_model(self, language: Optional[str]) -> str:
+        """Modelo concreto a usar para este idioma (solo varía con model_name='auto')."""
+        if self.model_name != AUTO_MODEL:
+            return self.model_name
+        return AUTO_MODEL_ENGLISH if language == 'en' else AUTO_MODEL_FALLBACK
+    
+    def _get_loaded(self, model_name: str) -> Tuple[Any, Any]:
+        """Retorna (modelo, pipeline) de `model_name`, cargándolo si hace falta."""
+        loaded = self._loaded.get(model_name)
+        if loaded is None:
+            model = None
             try:
-                from faster_whisper import WhisperModel
-                
-                self._model = WhisperModel(
-                    self.model_name,
-                    device=self.device,
-                    compute_type=self.compute_type,
-                    download_root=str(MODELS_DIR)
-                )
+                model = _get_shared_model(model_name, self.device, self.compute_type)
+                pipeline = None
                 
-                logger.info("Modelo cargado exitosamente")
+                if self.batch_size > 1:
+                    from faster_whisper import BatchedInferencePipeline
+                    
+                    # Agrupa los chunks con voz (VAD) y los pasa en lotes por el encoder
+                    pipeline = BatchedInferencePipeline(model=model)
                 
             except Exception as e:
+                if model is not None:
+                    _release_shared_model(model_name, self.device, self.compute_type)
                 logger.error(f"Error cargando modelo: {e}")
                 raise RuntimeError(f"No se pudo cargar el modelo Whisper: {e}")
+            
+            loaded = self._loaded[model_name] = (model, pipeline)
+        return loaded
+    
+    def _load_model(self):
+        """Carga el modelo de Whisper (lazy loading)."""
+        if self._model is None:
+            self._model, self._pipeline = self._get_loaded(self._pick_model(None))
         
         return self._model
     
-    def transcribe(
-        self, 
-        audio_path: str,
+    def iter_segments(
+        self,
+        audio_path: AudioInput,
         language: Optional[str] = None,
-        task: str = "transcribe",
-        include_timestamps: bool = True
-    ) -> TranscriptionResult:
+        task: str = "transcribe"
+    ) -> Tuple[Iterator[TranscriptionSegment], Any, str]:
         """
-        Transcribe un archivo de audio.
+        Inicia la transcripción sin esperar a que termine.
+        
+        `audio_path` puede ser una ruta o un ndarray float32 mono a 16 kHz; con un
+        array se omite la decodificación del archivo.
         
-        Args:
-            audio_path: Ruta al archivo de audio
-            language: Código de idioma (ej: 'es', 'en'). None para auto-detección.
-            task: 'transcribe' para mantener idioma original, 'translate' para traducir a inglés
-            include_timestamps: Si incluir timestamps por segmento
-            
         Returns:
-            TranscriptionResult con texto completo, segmentos y metadata
+            Tupla (segmentos, info, modelo). Los segmentos se decodifican a medida que se
+            consume el iterador; `info` (idioma, duración) está disponible de inmediato.
+            `modelo` es el que se usó realmente (con 'auto', el elegido según el idioma).
         """
-        # Validar que el archivo existe
-        audio_file = Path(audio_path)
-        if not audio_file.exists():
-            raise FileNotFoundError(f"Archivo de audio no encontrado: {audio_path}")
-        
-        logger.info(f"Iniciando transcripción de: {audio_path}")
+        if isinstance(audio_path, (str, os.PathLike)):
+            # Validar que el archivo existe
+            if not Path(audio_path).exists():
+                raise FileNotFoundError(f"Archivo de audio no encontrado: {audio_path}")
+            logger.info("Iniciando transcripción de: %s", audio_path)
+        else:
+            logger.info("Iniciando transcripción de %d muestras en memoria", len(audio_path))
         
         # Cargar modelo
-        model = self._load_model()
+        self._load_model()
+        model_name = self._pick_model(language)
+        model, pipeline = self._get_loaded(model_name)
         
         try:
-            # Realizar transcripción
-            segments_generator, info = model.transcribe(
-                audio_path,
+            options = dict(
                 language=language,
                 task=task,
                 beam_size=5,  # Balance precisión/velocidad
                 best_of=5,
                 temperature=0.0,  # Determinístico
-                condition_on_previous_text=True,
-                vad_filter=True,  # Filtrar silencio para mayor velocidad
+                # Silero VAD corre una vez sobre el PCM decodificado y al encoder solo
+                # llegan los tramos con voz (los timestamps se remapean al audio original)
+                vad_filter=True,
                 vad_parameters=dict(
-                    min_silence_duration_ms=500,
+                    min_silence_duration_ms=VAD_MIN_SILENCE_MS,
                 ),
             )
             
-            # Procesar segmentos
+            # Realizar transcripción
+            if pipeline is not None:
+                # Los chunks son independientes: no se condiciona en el texto previo.
+                # without_timestamps=False: el pipeline por defecto devuelve un único
+                # segmento por chunk de ~30s; así se mantienen los segmentos por frase
+                segments_generator, info = pipeline.transcribe(
+                    audio_path,
+                    batch_size=self.batch_size,
+                    without_timestamps=False,
+                    **options
+                )
+            else:
+                segments_generator, info = model.transcribe(
+                    audio_path,
+                    condition_on_previous_text=True,
+                    **options
+                )
+        except Exception as e:
+            logger.error(f"Error durante transcripción: {e}")
+            raise RuntimeError(f"Error transcribiendo audio: {e}")
+        
+        segments = (
+            TranscriptionSegment(start=segment.start, end=segment.end, text=segment.text)
+            for segment in segments_generator
+        )
+        return segments, info, model_name
+    
+    async def transcribe_stream(
+        self,
+        audio_path: AudioInput,
+        language: Optional[str] = None,
+        task: str = "transcribe"
+    ) -> AsyncIterator[TranscriptionSegment]:
+        """
+        Versión asíncrona de iter_segments para usar desde el event loop.
+        
+        La decodificación corre en un hilo aparte que deja los segmentos en una cola
+        acotada, así el llamador puede persistir/enviar cada segmento mientras se
+        decodifican los siguientes sin bloquear el loop.
+        """
+        segments_iter, _info, _model_name = await asyncio.to_thread(
+            self.iter_segments, audio_path, language, task
+        )
+        
+        pending: queue.Queue = queue.Queue(maxsize=STREAM_MAX_PENDING)
+        stop = threading.Event()
+        
+        def put(item) -> bool:
+            # Espera con timeout para poder abandonar si el consumidor se fue
+            while not stop.is_set():
+                try:
+                    pending.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def produce():
+            try:
+                for seg in segments_iter:
+                    if not put(seg):
+                        break
+                else:
+                    put(_STREAM_END)
+                    return
+            except Exception as e:
+                if put(e):
+                    return
+            # Consumidor cancelado: desbloquear un posible get() pendiente
+            try:
+                pending.put_nowait(_STREAM_END)
+            except queue.Full:
+                pass
+        
+        threading.Thread(target=produce, name="whisper-stream", daemon=True).start()
+        
+        try:
+            while True:
+                item = await asyncio.to_thread(pending.get)
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, Exception):
+                    logger.error(f"Error durante transcripción: {item}")
+                    raise RuntimeError(f"Error transcribiendo audio: {item}") from item
+                yield item
+        finally:
+            stop.set()
+    
+    def transcribe(
+        self, 
+        audio_path: AudioInput,
+        language: Optional[str] = None,
+        task: str = "transcribe",
+        include_timestamps: bool = True,
+        on_segment: Optional[Callable[[TranscriptionSegment], None]] = None
+    ) -> TranscriptionResult:
+        """
+        Transcribe un archivo de audio.
+        
+        Args:
+            audio_path: Ruta al archivo de audio, o ndarray float32 mono a 16 kHz
+            language: Código de idioma (ej: 'es', 'en'). None para auto-detección.
+            task: 'transcribe' para mantener idioma original, 'translate' para traducir a inglés
+            include_timestamps: Si incluir timestamps por segmento
+            on_segment: Se llama con cada segmento en cuanto se decodifica (ej: para
+                enviarlo por socket o persistirlo). Si se indica, los segmentos no se
+                acumulan y el resultado los trae vacíos.
+            
+        Returns:
+            TranscriptionResult con texto completo, segmentos y metadata
+        """
+        segments_iter, info, model_name = self.iter_segments(audio_path, language=language, task=task)
+        
+        try:
+            # Procesar segmentos (el texto ya viene sin espacios de TranscriptionSegment)
+            # Solo se guardan si van en el resultado (evita crecer en memoria con audios largos)
+            keep_segments = include_timestamps and on_segment is None
             segments = []
-            full_text_parts = []
+            segment_count = 0
+            text_buf = io.StringIO()
             
-            for segment in segments_generator:
-                seg = TranscriptionSegment(
-                    start=segment.start,
-                    end=segment.end,
-                    text=segment.text
-                )
-                segments.append(seg)
-                full_text_parts.append(segment.text.strip())
+            for seg in segments_iter:
+                if segment_count:
+                    text_buf.write(' ')
+                text_buf.write(seg.text)
+                segment_count += 1
+                if on_segment is not None:
+                    on_segment(seg)
+                elif keep_segments:
+                    segments.append(seg)
             
-            full_text = " ".join(full_text_parts)
+            full_text = text_buf.getvalue()
             
             result = TranscriptionResult(
                 text=full_text,
-                segments=segments if include_timestamps else [],
+                segments=segments,
                 language=info.language,
-                duration=info.duration
+                duration=info.duration,
+                model_name=model_name
             )
             
             logger.info(
-                f"Transcripción completada: {len(full_text)} caracteres, "
-                f"{len(segments)} segmentos, idioma={info.language}"
+                "Transcripción completada: %d caracteres, %d segmentos, idioma=%s",
+                len(full_text), segment_count, info.language
             )
             
             return result
@@ -213,8 +534,12 @@ class WhisperTranscriber:
     def unload_model(self):
         """Descarga el modelo de memoria para liberar recursos."""
         if self._model is not None:
+            self._pipeline = None
             del self._model
             self._model = None
+            for model_name in list(self._loaded):
+                del self._loaded[model_name]
+                _release_shared_model(model_name, self.device, self.compute_type)
             logger.info("Modelo descargado de memoria")
             
             # Limpiar caché de GPU si está disponible
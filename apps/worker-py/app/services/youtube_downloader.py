@@ -2,27 +2,42 @@
 YouTube Downloader Service
 Utiliza yt-dlp para extraer y descargar audio de videos de YouTube.
 """
+import asyncio
 import os
+import shutil
 import uuid
 import logging
-import re
+import threading
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Callable
 import yt_dlp
+from cachetools import TTLCache
+
+from app.services.youtube_url import ParsedYtUrl
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Info de videos ya consultada, por video ID (evita repetir extract_info)
+VIDEO_INFO_TTL = 24 * 3600  # 24 horas
+
+# Consultas de info simultáneas en get_video_info_many (YouTube limita por IP)
+INFO_FETCH_CONCURRENCY = 6
+
 # Directorio temporal para descargas
 TEMP_DIR = Path("/tmp/hybrid-brain-downloads")
 TEMP_DIR.mkdir(parents=True, exist_ok=True)
 
+# Tamaño máximo de un audio descargado (también el espacio que se reserva en RAM por descarga)
+MAX_FILESIZE = 500 * 1024 * 1024  # 500MB
+
 
 class YoutubeDownloader:
     """
     Servicio para descargar audio de videos de YouTube.
-    Extrae solo el audio en formato ligero (mp3) para optimizar espacio y velocidad.
+    Descarga solo el audio en su contenedor original (opus/m4a), sin re-codificar:
+    faster-whisper lo decodifica directamente.
     """
     
     COOKIE_FILE = '/app/cookies/cookies.txt'
@@ -30,7 +45,47 @@ class YoutubeDownloader:
     def __init__(self, output_dir: Optional[Path] = None):
         self.output_dir = output_dir or TEMP_DIR
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        # tmpfs opcional para las descargas; se usa mientras quepa un archivo máximo más
+        self.ram_dir: Optional[Path] = None
+        self._ram_reserved = 0
+        self._ram_lock = threading.Lock()
         self._cookie_file = self._detect_cookie_file()
+        # Instancias de YoutubeDL reutilizadas por hilo (no son thread-safe)
+        self._local = threading.local()
+        self._ydl_instances: List[yt_dlp.YoutubeDL] = []
+        self._ydl_lock = threading.Lock()
+        self._info_cache: TTLCache = TTLCache(maxsize=1024, ttl=VIDEO_INFO_TTL)
+        self._info_cache_lock = threading.Lock()  # TTLCache no es thread-safe
+    
+    def set_ram_dir(self, ram_dir: Path) -> None:
+        """Descarga en un tmpfs en RAM (ej: /dev/shm) mientras tenga espacio; si no, en output_dir."""
+        ram_dir.mkdir(parents=True, exist_ok=True)
+        self.ram_dir = ram_dir
+    
+    def _reserve_download_dir(self) -> Path:
+        """
+        Elige el directorio de la próxima descarga.
+        Cada descarga en curso en RAM reserva MAX_FILESIZE: varias descargas simultáneas
+        no pueden contar con el mismo espacio libre y llenar el tmpfs (ENOSPC).
+        """
+        if self.ram_dir is None:
+            return self.output_dir
+        with self._ram_lock:
+            try:
+                free = shutil.disk_usage(self.ram_dir).free
+            except OSError:
+                return self.output_dir
+            if free - self._ram_reserved < MAX_FILESIZE:
+                logger.info(f"💾 RAM sin espacio para otra descarga ({free // (1024 * 1024)} MB libres), usando disco")
+                return self.output_dir
+            self._ram_reserved += MAX_FILESIZE
+            return self.ram_dir
+    
+    def _release_download_dir(self, download_dir: Path) -> None:
+        """Libera la reserva de RAM al terminar la descarga (el archivo ya ocupa su tamaño real)."""
+        if download_dir == self.ram_dir:
+            with self._ram_lock:
+                self._ram_reserved -= MAX_FILESIZE
         
     def _detect_cookie_file(self) -> Optional[str]:
         """Detecta si hay un archivo de cookies disponible."""
@@ -64,70 +119,26 @@ class YoutubeDownloader:
         """
         opts = self._base_ydl_options()
         opts.update({
-            # Extraer solo audio - formato flexible
-            'format': 'bestaudio/best',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '128',  # 128kbps es suficiente para transcripción
-            }],
+            # Solo audio, en el códec que ya sirve YouTube (sin postprocesado con ffmpeg);
+            # `best` cubre videos con solo formatos muxed (faster-whisper extrae el audio)
+            'format': 'bestaudio[acodec=opus]/bestaudio[ext=m4a]/bestaudio/best',
             # Ruta de salida
-            'outtmpl': output_path,
+            'outtmpl': output_path + '.%(ext)s',
             # No buscar formatos de video
             'extract_flat': False,
             # Límite de tamaño de archivo
-            'max_filesize': 500 * 1024 * 1024,  # 500MB máximo
+            'max_filesize': MAX_FILESIZE,
         })
         
         return opts
 
-    def validate_url(self, url: str) -> bool:
-        """
-        Valida que la URL sea de YouTube.
-        """
-        youtube_patterns = [
-            'youtube.com/watch',
-            'youtu.be/',
-            'youtube.com/shorts/',
-            'youtube.com/live/'
-        ]
-        return any(pattern in url for pattern in youtube_patterns)
-    
-    def extract_video_id(self, url: str) -> Optional[str]:
-        """
-        Extrae el ID del video de una URL de YouTube.
-        """
-        if not url:
-            return None
-        
-        patterns = [
-            r'(?:v=|/)([0-9A-Za-z_-]{11})(?:[?&]|$)',
-            r'(?:youtu\.be/)([0-9A-Za-z_-]{11})',
-            r'(?:embed/)([0-9A-Za-z_-]{11})',
-            r'(?:shorts/)([0-9A-Za-z_-]{11})',
-            r'(?:live/)([0-9A-Za-z_-]{11})',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-        
-        if re.match(r'^[0-9A-Za-z_-]{11}$', url):
-            return url
-        
-        return None
-    
-    def get_video_info(self, url: str) -> Dict[str, Any]:
+    def _get_info_options(self) -> Dict[str, Any]:
         """
-        Obtiene información del video sin descargarlo.
+        Configura las opciones de yt-dlp para leer metadatos sin descargar.
         
-        IMPORTANTE: Esta función usa configuración específica para evitar
+        IMPORTANTE: configuración específica para evitar
         el error "Requested format is not available".
         """
-        if not self.validate_url(url):
-            raise ValueError(f"URL no válida de YouTube: {url}")
-        
         opts = self._base_ydl_options()
         opts.update({
             # CRÍTICO: No intentar procesar formatos
@@ -140,40 +151,99 @@ class YoutubeDownloader:
             'check_formats': None,
         })
         
+        return opts
+    
+    def _thread_ydl(self, name: str, make_opts: Callable[[], Dict[str, Any]]) -> yt_dlp.YoutubeDL:
+        """
+        Retorna la instancia `name` de YoutubeDL de este hilo, creándola la primera vez.
+        Así las opciones, extractores y cookies se inicializan una vez por hilo.
+        """
+        ydl = getattr(self._local, name, None)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(make_opts())
+            setattr(self._local, name, ydl)
+            with self._ydl_lock:
+                self._ydl_instances.append(ydl)
+        return ydl
+    
+    def close(self) -> None:
+        """Cierra las instancias de YoutubeDL (guarda cookies y libera conexiones)."""
+        with self._ydl_lock:
+            instances, self._ydl_instances = self._ydl_instances, []
+        self._local = threading.local()
+        for ydl in instances:
+            try:
+                ydl.close()
+            except Exception as e:
+                logger.warning(f"Error cerrando YoutubeDL: {e}")
+    
+    def validate_url(self, url: str) -> bool:
+        """
+        Valida que la URL sea de YouTube.
+        """
+        return ParsedYtUrl.parse(url).is_valid
+    
+    def extract_video_id(self, url: str) -> Optional[str]:
+        """
+        Extrae el ID del video de una URL de YouTube.
+        """
+        return ParsedYtUrl.parse(url).video_id if url else None
+    
+    def get_video_info(self, url: str, parsed: Optional[ParsedYtUrl] = None) -> Dict[str, Any]:
+        """
+        Obtiene información del video sin descargarlo.
+        """
+        parsed = parsed or ParsedYtUrl.parse(url)
+        if not parsed.is_valid:
+            raise ValueError(f"URL no válida de YouTube: {url}")
+        
+        video_id = parsed.video_id
+        if video_id:
+            with self._info_cache_lock:
+                cached = self._info_cache.get(video_id)
+            if cached is not None:
+                return cached
+        
         try:
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                
-                if not info:
-                    raise ValueError("No se pudo obtener información del video")
-                
-                return {
-                    'id': info.get('id'),
-                    'title': info.get('title'),
-                    'duration': info.get('duration'),  # segundos
-                    'channel': info.get('channel') or info.get('uploader'),
-                    'upload_date': info.get('upload_date'),
-                    'view_count': info.get('view_count'),
-                    'description': (info.get('description', '') or '')[:500],
-                    'thumbnail': info.get('thumbnail'),
-                }
+            ydl = self._thread_ydl('info_ydl', self._get_info_options)
+            info = ydl.extract_info(url, download=False)
+            
+            if not info:
+                raise ValueError("No se pudo obtener información del video")
+            
+            result = {
+                'id': info.get('id'),
+                'title': info.get('title'),
+                'duration': info.get('duration'),  # segundos
+                'channel': info.get('channel') or info.get('uploader'),
+                'upload_date': info.get('upload_date'),
+                'view_count': info.get('view_count'),
+                'description': (info.get('description', '') or '')[:500],
+                'thumbnail': info.get('thumbnail'),
+            }
+            
+            if video_id:
+                with self._info_cache_lock:
+                    self._info_cache[video_id] = result
+            return result
                 
         except Exception as e:
             logger.error(f"Error obteniendo info del video: {e}")
             raise
     
-    def get_video_info_safe(self, url: str) -> Optional[Dict[str, Any]]:
+    def get_video_info_safe(self, url: str, parsed: Optional[ParsedYtUrl] = None) -> Optional[Dict[str, Any]]:
         """
         Versión segura de get_video_info que no lanza excepciones.
         Retorna None si falla.
         """
+        parsed = parsed or ParsedYtUrl.parse(url)
         try:
-            return self.get_video_info(url)
+            return self.get_video_info(url, parsed=parsed)
         except Exception as e:
             logger.warning(f"No se pudo obtener info del video: {e}")
             
             # Intentar al menos extraer el ID
-            video_id = self.extract_video_id(url)
+            video_id = parsed.video_id
             if video_id:
                 return {
                     'id': video_id,
@@ -187,7 +257,22 @@ class YoutubeDownloader:
                 }
             return None
     
-    def download_audio(self, url: str) -> Dict[str, Any]:
+    async def get_video_info_many(self, urls: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Obtiene la información de varios videos (ej: una playlist) en paralelo.
+        
+        Returns:
+            Lista en el mismo orden que `urls`, con el resultado de get_video_info_safe.
+        """
+        semaphore = asyncio.Semaphore(INFO_FETCH_CONCURRENCY)
+        
+        async def fetch(url: str) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await asyncio.to_thread(self.get_video_info_safe, url)
+        
+        return await asyncio.gather(*(fetch(url) for url in urls))
+    
+    def download_audio(self, url: str, parsed: Optional[ParsedYtUrl] = None) -> Dict[str, Any]:
         """
         Descarga el audio de un video de YouTube.
         
@@ -197,63 +282,69 @@ class YoutubeDownloader:
                 - video_info: Información del video
                 - file_size: Tamaño del archivo en bytes
         """
-        if not self.validate_url(url):
+        parsed = parsed or ParsedYtUrl.parse(url)
+        if not parsed.is_valid:
             raise ValueError(f"URL no válida de YouTube: {url}")
         
         # Generar nombre único para el archivo
         file_id = str(uuid.uuid4())[:8]
-        output_path = str(self.output_dir / f"{file_id}")
+        download_dir = self._reserve_download_dir()
+        output_path = str(download_dir / f"{file_id}")
         
         logger.info(f"📥 Descargando audio de: {url}")
         
-        ydl_opts = self._get_download_options(output_path)
-        
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                
-                if not info:
-                    raise RuntimeError("No se pudo extraer información del video")
-                
-                # yt-dlp añade la extensión automáticamente
-                audio_file = Path(f"{output_path}.mp3")
-                
-                if not audio_file.exists():
-                    # Buscar el archivo con cualquier extensión
-                    possible_files = list(self.output_dir.glob(f"{file_id}.*"))
-                    if possible_files:
-                        audio_file = possible_files[0]
-                    else:
-                        raise FileNotFoundError("No se encontró el archivo de audio descargado")
-                
-                file_size = audio_file.stat().st_size
+            ydl = self._thread_ydl('download_ydl', lambda: self._get_download_options(output_path))
+            # Cada descarga usa su propio nombre de archivo
+            ydl.params['outtmpl'] = {'default': output_path + '.%(ext)s'}
+            info = ydl.extract_info(url, download=True)
+            
+            if not info:
+                raise RuntimeError("No se pudo extraer información del video")
+            
+            # yt-dlp informa la ruta final de cada descarga
+            downloads = info.get('requested_downloads') or []
+            filepath = downloads[0].get('filepath') if downloads else None
+            audio_file = Path(filepath) if filepath else None
+            
+            if audio_file is None or not audio_file.exists():
+                # Buscar el archivo con cualquier extensión
+                possible_files = list(download_dir.glob(f"{file_id}.*"))
+                if possible_files:
+                    audio_file = possible_files[0]
+                else:
+                    raise FileNotFoundError("No se encontró el archivo de audio descargado")
+            
+            file_size = audio_file.stat().st_size
 
-                if file_size == 0:
-                    try:
-                        audio_file.unlink()
-                    except:
-                        pass
-                    raise RuntimeError("El archivo descargado está vacío (0 bytes). Posible bloqueo de YouTube.")
-                
-                logger.info(f"✅ Audio descargado: {audio_file} ({file_size / 1024 / 1024:.2f} MB)")
-                
-                return {
-                    'file_path': str(audio_file),
-                    'video_info': {
-                        'id': info.get('id'),
-                        'title': info.get('title'),
-                        'duration': info.get('duration'),
-                        'channel': info.get('channel') or info.get('uploader'),
-                    },
-                    'file_size': file_size,
-                }
-                
+            if file_size == 0:
+                try:
+                    audio_file.unlink()
+                except:
+                    pass
+                raise RuntimeError("El archivo descargado está vacío (0 bytes). Posible bloqueo de YouTube.")
+            
+            logger.info(f"✅ Audio descargado: {audio_file} ({file_size / 1024 / 1024:.2f} MB)")
+            
+            return {
+                'file_path': str(audio_file),
+                'video_info': {
+                    'id': info.get('id'),
+                    'title': info.get('title'),
+                    'duration': info.get('duration'),
+                    'channel': info.get('channel') or info.get('uploader'),
+                },
+                'file_size': file_size,
+            }
+            
         except yt_dlp.utils.DownloadError as e:
             logger.error(f"Error de descarga: {e}")
             raise RuntimeError(f"Error descargando video: {str(e)}")
         except Exception as e:
             logger.error(f"Error inesperado: {e}")
             raise
+        finally:
+            self._release_download_dir(download_dir)
     
     def cleanup(self, file_path: str) -> bool:
         """
@@ -276,19 +367,19 @@ class YoutubeDownloader:
         """
         import time
         
-        current_time = time.time()
-        max_age_seconds = max_age_hours * 3600
+        cutoff = time.time() - max_age_hours * 3600
         deleted_count = 0
         
-        for file_path in self.output_dir.glob("*"):
-            if file_path.is_file():
-                file_age = current_time - file_path.stat().st_mtime
-                if file_age > max_age_seconds:
-                    try:
-                        file_path.unlink()
-                        deleted_count += 1
-                        logger.info(f"🗑️ Archivo antiguo eliminado: {file_path}")
-                    except Exception as e:
-                        logger.warning(f"No se pudo eliminar {file_path}: {e}")
+        # scandir reutiliza el tipo/stat de cada entrada en vez de un Path + stat por archivo
+        for directory in filter(None, (self.output_dir, self.ram_dir)):
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                        try:
+                            os.unlink(entry.path)
+                            deleted_count += 1
+                            logger.info(f"🗑️ Archivo antiguo eliminado: {entry.path}")
+                        except OSError as e:
+                            logger.warning(f"No se pudo eliminar {entry.path}: {e}")
         
         return deleted_count
@@ -4,13 +4,22 @@ Obtiene transcripciones nativas de YouTube usando múltiples métodos:
 1. youtube_transcript_api (API directa)
 2. yt-dlp con skip_download para subtítulos
 """
+import hashlib
+import io
 import logging
 import re
 import os
-import glob
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Optional, List, Dict, Any
-import yt_dlp
+from typing import Optional, List, Dict, Any, Tuple, Union, AnyStr
+import orjson
+import requests
+from cachetools import TTLCache
 from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api._errors import (
     TranscriptsDisabled,
@@ -18,6 +27,7 @@ from youtube_transcript_api._errors import (
     VideoUnavailable
 )
 from app.services.whisper_transcriber import TranscriptionResult, TranscriptionSegment
+from app.services.youtube_url import ParsedYtUrl
 
 
 # Configurar logging
@@ -27,6 +37,170 @@ logger = logging.getLogger(__name__)
 TEMP_DIR = Path("/tmp/yt_transcripts")
 TEMP_DIR.mkdir(parents=True, exist_ok=True)
 
+# Transcripciones ya obtenidas, en disco para sobrevivir reinicios del contenedor
+TRANSCRIPT_CACHE_DIR = TEMP_DIR / "cache"
+TRANSCRIPT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+TRANSCRIPT_CACHE_TTL = int(os.getenv('TRANSCRIPT_CACHE_TTL', str(7 * 86400)))  # 7 días
+# Tamaño máximo de la caché en disco: al superarlo se borran primero las más antiguas
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.getenv('TRANSCRIPT_CACHE_MAX_MB', '512')) * 1024 * 1024
+# Cada cuánto se barre la caché en disco desde las escrituras (worker de larga duración)
+TRANSCRIPT_CACHE_SWEEP_INTERVAL = 3600  # 1 hora
+
+# Probar youtube_transcript_api y yt-dlp a la vez en vez de en secuencia
+PARALLEL_FETCH = os.getenv('TRANSCRIPT_PARALLEL_FETCH', '0') == '1'
+# Hilos compartidos por todas las búsquedas en paralelo (2 por transcripción): acota los
+# fetch de yt-dlp que siguen corriendo tras perder la carrera y reutiliza sus sesiones HTTP
+PARALLEL_FETCH_WORKERS = int(os.getenv('TRANSCRIPT_PARALLEL_WORKERS', '8'))
+_parallel_executor = ThreadPoolExecutor(max_workers=PARALLEL_FETCH_WORKERS, thread_name_prefix='yt-transcript')
+
+# Parser VTT de una sola pasada (0 = parser original con regex)
+VTT_FAST_PARSER = os.getenv('VTT_FAST_PARSER', '1') == '1'
+
+# Conexiones HTTP reutilizables por host en el pool compartido entre hilos
+HTTP_POOL_MAXSIZE = 16
+
+# Cues recientes contra los que se descartan textos repetidos al parsear VTT
+VTT_DEDUP_WINDOW = 8
+
+# Regex compiladas una sola vez a nivel de módulo
+# Timestamps: 00:00:00.000 --> 00:00:03.947 o 00:00.000 --> 00:03.947
+_TIME_RE = re.compile(
+    r'((?:\d{1,2}:)?\d{2}:\d{2}[.,]\d{3})\s*-->\s*((?:\d{1,2}:)?\d{2}:\d{2}[.,]\d{3})'
+)
+# Ruido de una línea de texto: tags VTT (<c.colorE5E5E5>, <00:00:01.000>) y timestamps inline
+_VTT_NOISE_RE = re.compile(r'<[^>]+>|\d{1,2}:\d{2}:\d{2}[.,]\d{3}')
+_WS_RE = re.compile(r'\s+')
+# Timestamps inline fuera de tags, para el scanner (que ya quitó los tags), en str y bytes
+_INLINE_TS_PATTERN = r'\d{1,2}:\d{2}:\d{2}[.,]\d{3}'
+_INLINE_TS_RE = re.compile(_INLINE_TS_PATTERN)
+_INLINE_TS_RE_BYTES = re.compile(_INLINE_TS_PATTERN.encode())
+# Saltos de línea y tabs a espacio en una sola pasada (texto de youtube_transcript_api)
+_LINE_BREAKS_TABLE = str.maketrans({'\n': ' ', '\r': ' ', '\t': ' '})
+
+
+def _parse_vtt_time(value: str) -> Optional[float]:
+    """Convierte HH:MM:SS.mmm o MM:SS.mmm a segundos (None si no es un tiempo)."""
+    parts = value.replace(',', '.').split(':')
+    if len(parts) not in (2, 3) or '.' not in parts[-1]:
+        return None
+    try:
+        seconds = float(parts[-1])
+        minutes = int(parts[-2])
+        hours = int(parts[0]) if len(parts) == 3 else 0
+    except ValueError:
+        return None
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _parse_cue_timing(line: str) -> Optional[Tuple[float, float]]:
+    """Lee `inicio --> fin [ajustes]` de una línea de cue."""
+    arrow = line.find('-->')
+    if arrow < 0:
+        return None
+    left = line[:arrow].split()
+    right = line[arrow + 3:].split()
+    if not left or not right:
+        return None
+    start = _parse_vtt_time(left[-1])
+    end = _parse_vtt_time(right[0])
+    if start is None or end is None:
+        return None
+    return start, end
+
+
+def _strip_vtt_tags(line: AnyStr) -> AnyStr:
+    """
+    Quita tags como <c.colorE5E5E5> o <00:00:01.000> recorriendo la línea una vez.
+    Un tag necesita al menos un carácter entre '<' y '>': un '<>' literal se conserva.
+    """
+    lt_char, gt_char = (b'<', b'>') if isinstance(line, bytes) else ('<', '>')
+    if lt_char not in line:
+        return line
+    parts = []
+    pos = 0  # inicio del texto aún no copiado
+    search = 0
+    while True:
+        lt = line.find(lt_char, search)
+        gt = line.find(gt_char, lt + 1) if lt >= 0 else -1
+        if gt < 0:
+            break
+        if gt == lt + 1:
+            search = gt + 1
+            continue
+        parts.append(line[pos:lt])
+        pos = search = gt + 1
+    parts.append(line[pos:])
+    return line[:0].join(parts)
+
+
+def _scan_vtt(content: AnyStr) -> List[Tuple[float, float, str]]:
+    """
+    Recorre el VTT una sola vez y retorna (inicio, fin, texto limpio) por cue.
+    Estados: fuera de cue (cabecera, identificadores, NOTE) o dentro del texto de un cue.
+    
+    Acepta `bytes` tal cual se descargan: los marcadores del formato son ASCII (nunca
+    aparecen dentro de un carácter UTF-8 multibyte), así que el texto se limpia en bytes
+    y solo se decodifica una vez por cue, al emitirlo; las líneas de tiempos se decodifican
+    aparte porque son cortas.
+    """
+    is_bytes = isinstance(content, bytes)
+    if is_bytes:
+        newline_char, arrow, space, nbsp, colon = b'\n', b'-->', b' ', b'&nbsp;', b':'
+        inline_ts_re = _INLINE_TS_RE_BYTES
+    else:
+        newline_char, arrow, space, nbsp, colon = '\n', '-->', ' ', '&nbsp;', ':'
+        inline_ts_re = _INLINE_TS_RE
+    
+    cues = []
+    timing = None  # None = fuera de un cue
+    text_acc = []
+    
+    def emit() -> None:
+        text = space.join(text_acc)
+        if is_bytes:
+            # bytes.split() solo conoce espacios ASCII: colapsar también los Unicode (NBSP)
+            text = ' '.join(text.decode('utf-8', 'replace').split())
+            if not text:
+                return
+        cues.append((timing[0], timing[1], text))
+    
+    find = content.find
+    pos = 0
+    length = len(content)
+    while pos <= length:
+        newline = find(newline_char, pos)
+        if newline < 0:
+            newline = length
+        line = content[pos:newline].strip()
+        pos = newline + 1
+        
+        new_timing = None
+        if arrow in line:
+            new_timing = _parse_cue_timing(line.decode('ascii', 'replace') if is_bytes else line)
+        if new_timing is not None or not line:
+            # Fin del cue actual: nueva línea de tiempos o línea vacía
+            if timing is not None and text_acc:
+                emit()
+            timing = new_timing
+            text_acc = []
+            continue
+        
+        if timing is None:
+            continue
+        
+        # Limpiar tags, timestamps inline y colapsar espacios (sin decodificar todavía)
+        text = _strip_vtt_tags(line)
+        if colon in text:
+            text = inline_ts_re.sub(text[:0], text)
+        clean_text = space.join(text.split())
+        if clean_text and clean_text != nbsp:
+            text_acc.append(clean_text)
+    
+    if timing is not None and text_acc:
+        emit()
+    
+    return cues
+
 
 class YoutubeTranscriptService:
     """
@@ -42,6 +216,36 @@ class YoutubeTranscriptService:
         self._cookie_file = self._detect_cookie_file()
         if self._cookie_file:
             logger.info(f"🍪 Cookies detectadas: {self._cookie_file}")
+        
+        # Sesión HTTP por hilo (cookies/headers propios: requests.Session no es thread-safe)
+        # montada sobre un único pool de conexiones de urllib3, que sí es thread-safe:
+        # cualquier hilo reutiliza las conexiones (DNS + TLS) ya abiertas con YouTube
+        self._local = threading.local()
+        self._http_adapter = requests.adapters.HTTPAdapter(pool_maxsize=HTTP_POOL_MAXSIZE)
+        
+        # Transcripciones en memoria delante de la caché en disco: (video_id, idiomas) -> resultado
+        self._memory_cache: TTLCache = TTLCache(maxsize=1024, ttl=TRANSCRIPT_CACHE_TTL)
+        self._memory_cache_lock = threading.Lock()  # TTLCache no es thread-safe
+        self._last_cache_sweep = time.monotonic()
+    
+    def _thread_api(self) -> YouTubeTranscriptApi:
+        """Cliente de youtube_transcript_api de este hilo, con su propia sesión HTTP."""
+        api = getattr(self._local, 'transcript_api', None)
+        if api is None:
+            http = self._local.http = requests.Session()
+            http.mount('https://', self._http_adapter)
+            http.mount('http://', self._http_adapter)
+            api = self._local.transcript_api = YouTubeTranscriptApi(http_client=http)
+        return api
+    
+    def warm_up(self) -> None:
+        """Abre la conexión con YouTube en el pool compartido por todos los hilos."""
+        try:
+            self._thread_api()
+            self._local.http.head('https://www.youtube.com', timeout=5)
+            logger.info("🔥 Conexión con YouTube precalentada")
+        except requests.RequestException as e:
+            logger.warning(f"⚠️ No se pudo precalentar la conexión con YouTube: {e}")
     
     def _detect_cookie_file(self) -> Optional[str]:
         """Detecta si hay un archivo de cookies disponible."""
@@ -51,31 +255,14 @@ class YoutubeTranscriptService:
     
     def extract_video_id(self, url: str) -> Optional[str]:
         """
-        Extrae el ID del video de una URL de YouTube.
+        Extrae el ID del video de una URL de YouTube (o un ID suelto de 11 caracteres).
         Soporta múltiples formatos de URL.
         """
         if not url:
             return None
         
-        # Patrones para extraer video ID
-        patterns = [
-            r'(?:v=|/)([0-9A-Za-z_-]{11})(?:[?&]|$)',  # ?v=ID o /ID
-            r'(?:youtu\.be/)([0-9A-Za-z_-]{11})',       # youtu.be/ID
-            r'(?:embed/)([0-9A-Za-z_-]{11})',           # embed/ID
-            r'(?:shorts/)([0-9A-Za-z_-]{11})',          # shorts/ID
-            r'(?:live/)([0-9A-Za-z_-]{11})',            # live/ID
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-        
-        # Si ya es un ID de 11 caracteres
-        if re.match(r'^[0-9A-Za-z_-]{11}$', url):
-            return url
-        
-        return None
+        # Una sola regex compilada con todas las variantes (ver youtube_downloader)
+        return ParsedYtUrl.parse(url).video_id
 
     def _parse_time_str(self, time_str: str) -> float:
         """Convierte HH:MM:SS.mmm a segundos float."""
@@ -92,88 +279,42 @@ class YoutubeTranscriptService:
         except (ValueError, AttributeError):
             return 0.0
 
-    def _parse_vtt_content(self, content: str, lang_code: str) -> Optional[TranscriptionResult]:
+    def _parse_vtt_content(self, content: Union[str, bytes], lang_code: str) -> Optional[TranscriptionResult]:
         """
         Parsea contenido VTT y lo convierte a TranscriptionResult.
         Maneja tanto formato VTT estándar como formato "karaoke" de YouTube.
+        Acepta el contenido descargado en `bytes` sin decodificarlo antes.
         """
-        segments = []
-        full_text_parts = []
+        if VTT_FAST_PARSER:
+            cues = _scan_vtt(content)
+        else:
+            if isinstance(content, bytes):
+                content = content.decode('utf-8')
+            cues = self._scan_vtt_regex(content)
         
-        # Regex para timestamps: 00:00:00.000 --> 00:00:03.947 o 00:00.000 --> 00:03.947
-        time_pattern = re.compile(
-            r'(\d{1,2}:?\d{2}:\d{2}[.,]\d{3})\s*-->\s*(\d{1,2}:?\d{2}:\d{2}[.,]\d{3})'
-        )
-        
-        lines = content.splitlines()
-        current_start = None
-        current_end = None
+        segments = []
+        # Ventana de textos recientes: el VTT karaoke repite la misma línea en varios cues
+        recent = deque()
+        recent_texts = set()
         
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-            time_match = time_pattern.search(line)
-            
-            if time_match:
-                # Normalizar formato de tiempo (reemplazar , por .)
-                start_str = time_match.group(1).replace(',', '.')
-                end_str = time_match.group(2).replace(',', '.')
-                
-                current_start = self._parse_time_str(start_str)
-                current_end = self._parse_time_str(end_str)
-                
-                # Acumular texto hasta la próxima línea vacía o timestamp
-                text_acc = []
-                i += 1
-                
-                while i < len(lines):
-                    next_line = lines[i].strip()
-                    
-                    # Fin del bloque de texto
-                    if not next_line:
-                        i += 1
-                        break
-                    
-                    # Nuevo timestamp encontrado
-                    if time_pattern.search(next_line):
-                        break
-                    
-                    # Limpiar tags VTT como <c.colorE5E5E5>, <00:00:01.000>, etc
-                    clean_text = re.sub(r'<[^>]+>', '', next_line).strip()
-                    # Limpiar timestamps inline
-                    clean_text = re.sub(r'\d{1,2}:\d{2}:\d{2}[.,]\d{3}', '', clean_text).strip()
-                    # Limpiar espacios múltiples
-                    clean_text = re.sub(r'\s+', ' ', clean_text).strip()
-                    
-                    if clean_text and clean_text != '&nbsp;':
-                        text_acc.append(clean_text)
-                    
-                    i += 1
-                
-                if text_acc:
-                    segment_text = " ".join(text_acc)
-                    
-                    # Evitar duplicados consecutivos (común en VTT estilo karaoke)
-                    if not segments or segments[-1].text != segment_text:
-                        segments.append(TranscriptionSegment(
-                            start=current_start,
-                            end=current_end,
-                            text=segment_text
-                        ))
-                        full_text_parts.append(segment_text)
-            else:
-                i += 1
+        for start, end, segment_text in cues:
+            if segment_text in recent_texts:
+                continue
+            segments.append(TranscriptionSegment(
+                start=start,
+                end=end,
+                text=segment_text
+            ))
+            recent.append(segment_text)
+            recent_texts.add(segment_text)
+            if len(recent) > VTT_DEDUP_WINDOW:
+                recent_texts.discard(recent.popleft())
         
         if not segments:
             return None
         
-        # Deduplicar texto final (a veces hay repeticiones)
-        unique_parts = []
-        for part in full_text_parts:
-            if not unique_parts or unique_parts[-1] != part:
-                unique_parts.append(part)
-        
-        full_text = " ".join(unique_parts)
+        # Los segmentos ya vienen sin repeticiones (ventana de deduplicación)
+        full_text = " ".join(seg.text for seg in segments)
         
         return TranscriptionResult(
             text=full_text,
@@ -182,6 +323,60 @@ class YoutubeTranscriptService:
             duration=segments[-1].end if segments else 0.0
         )
 
+    def _scan_vtt_regex(self, content: str) -> List[Tuple[float, float, str]]:
+        """
+        Parser VTT original basado en regex (VTT_FAST_PARSER=0).
+        Retorna (inicio, fin, texto limpio) por cada cue con texto.
+        """
+        cues = []
+        
+        # Líneas producidas de forma perezosa (sin materializar la lista completa)
+        lines = (raw.strip() for raw in io.StringIO(content, newline=None))
+        line = next(lines, None)
+        
+        while line is not None:
+            # '-->' es una búsqueda de substring en C: la regex solo corre en líneas de tiempos
+            time_match = _TIME_RE.search(line) if '-->' in line else None
+            
+            if not time_match:
+                line = next(lines, None)
+                continue
+            
+            # Normalizar formato de tiempo (reemplazar , por .)
+            start_str = time_match.group(1).replace(',', '.')
+            end_str = time_match.group(2).replace(',', '.')
+            
+            current_start = self._parse_time_str(start_str)
+            current_end = self._parse_time_str(end_str)
+            
+            # Acumular texto hasta la próxima línea vacía o timestamp
+            text_acc = []
+            line = next(lines, None)
+            
+            while line is not None:
+                # Fin del bloque de texto
+                if not line:
+                    line = next(lines, None)
+                    break
+                
+                # Nuevo timestamp encontrado: se procesa en la siguiente vuelta
+                if '-->' in line and _TIME_RE.search(line):
+                    break
+                
+                # Quitar tags y timestamps inline en una pasada, luego colapsar espacios
+                clean_text = _VTT_NOISE_RE.sub('', line)
+                clean_text = _WS_RE.sub(' ', clean_text).strip()
+                
+                if clean_text and clean_text != '&nbsp;':
+                    text_acc.append(clean_text)
+                
+                line = next(lines, None)
+            
+            if text_acc:
+                cues.append((current_start, current_end, " ".join(text_acc)))
+        
+        return cues
+
     def _fetch_with_transcript_api(self, video_id: str, languages: List[str]) -> Optional[TranscriptionResult]:
         """
         Intenta obtener transcripción usando youtube_transcript_api.
@@ -192,7 +387,7 @@ class YoutubeTranscriptService:
             
             # Intentar listar transcripciones disponibles
             try:
-                transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+                transcript_list = self._thread_api().list(video_id)
             except Exception as list_error:
                 logger.warning(f"No se pudo listar transcripciones: {list_error}")
                 return None
@@ -233,29 +428,24 @@ class YoutubeTranscriptService:
                     return None
             
             # Obtener datos
-            data = transcript.fetch()
+            # FetchedTranscript: snippets con atributos ya tipados (text: str, start/duration: float)
+            fetched = transcript.fetch()
             
             # Convertir al formato interno
             segments = []
-            full_text_parts = []
             
-            for item in data:
-                text = item.get('text', '').replace('\n', ' ').strip()
+            for snippet in fetched:
+                text = snippet.text.translate(_LINE_BREAKS_TABLE).strip()
                 if not text:
                     continue
-                    
-                start = float(item.get('start', 0))
-                duration = float(item.get('duration', 0))
-                end = start + duration
-                
-                seg = TranscriptionSegment(start=start, end=end, text=text)
-                segments.append(seg)
-                full_text_parts.append(text)
+                
+                start = snippet.start
+                segments.append(TranscriptionSegment(start=start, end=start + snippet.duration, text=text))
             
             if not segments:
                 return None
             
-            full_text = " ".join(full_text_parts)
+            full_text = " ".join(seg.text for seg in segments)
             
             return TranscriptionResult(
                 text=full_text,
@@ -285,16 +475,15 @@ class YoutubeTranscriptService:
         IMPORTANTE: Usamos configuración específica para SOLO obtener subtítulos,
         sin intentar procesar formatos de video.
         """
+        # Import diferido: yt-dlp carga cientos de extractores y solo se usa en este fallback
+        import yt_dlp
+
+        # Directorio propio por llamada: dos jobs del mismo video no se pisan los archivos
+        job_dir = Path(tempfile.mkdtemp(prefix=f"{video_id}_", dir=TEMP_DIR))
         try:
             logger.info(f"📥 Intentando yt-dlp para subtítulos de: {video_id}")
             
-            # Limpiar posibles archivos anteriores
-            base_output = TEMP_DIR / video_id
-            for f in glob.glob(f"{base_output}*"):
-                try:
-                    os.remove(f)
-                except:
-                    pass
+            base_output = job_dir / video_id
             
             # Configuración CRÍTICA para solo subtítulos
             # El truco está en NO especificar formato de video
@@ -349,31 +538,35 @@ class YoutubeTranscriptService:
                 subtitles = info.get('subtitles', {})
                 auto_subs = info.get('automatic_captions', {})
                 
+                # Un solo dict combinado (las automáticas tienen prioridad si un idioma
+                # está en ambos); iterar un ChainMap reconstruye un dict en cada pasada
                 available_subs = {**subtitles, **auto_subs}
                 
                 if not available_subs:
                     logger.warning("No hay subtítulos disponibles via yt-dlp")
                     return None
                 
-                logger.info(f"📋 Subtítulos disponibles: {list(available_subs.keys())}")
+                logger.info(f"📋 Subtítulos disponibles: {list(available_subs)}")
                 
                 # Encontrar el mejor idioma disponible
+                # Primera variante disponible de cada idioma base (ej: 'es' -> 'es-419')
+                variants = {}
+                for available_lang in available_subs:
+                    variants.setdefault(available_lang.split('-', 1)[0], available_lang)
+                
                 selected_lang = None
                 for lang in languages:
                     if lang in available_subs:
                         selected_lang = lang
                         break
                     # Buscar variantes (ej: es-419, en-US)
-                    for available_lang in available_subs.keys():
-                        if available_lang.startswith(lang):
-                            selected_lang = available_lang
-                            break
-                    if selected_lang:
+                    if lang in variants:
+                        selected_lang = variants[lang]
                         break
                 
                 if not selected_lang:
                     # Usar el primero disponible
-                    selected_lang = list(available_subs.keys())[0]
+                    selected_lang = next(iter(available_subs))
                     logger.info(f"Usando subtítulo alternativo: {selected_lang}")
                 
                 # Obtener URL del subtítulo
@@ -407,7 +600,7 @@ class YoutubeTranscriptService:
                 )
                 
                 with urllib.request.urlopen(req, timeout=30) as response:
-                    content = response.read().decode('utf-8')
+                    content = response.read()  # bytes: el parser decodifica solo el texto
                 
                 if not content:
                     logger.warning("Subtítulo vacío")
@@ -426,16 +619,144 @@ class YoutubeTranscriptService:
             return None
         finally:
             # Limpiar archivos temporales
-            for f in glob.glob(f"{base_output}*"):
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+    def _cache_path(self, video_id: str, languages: List[str]) -> Path:
+        """Archivo de caché para (video_id, idiomas)."""
+        langs_hash = hashlib.sha1(','.join(languages).encode()).hexdigest()[:12]
+        return TRANSCRIPT_CACHE_DIR / f"{video_id}-{langs_hash}.json"
+    
+    def _read_cached(self, video_id: str, languages: List[str]) -> Optional[TranscriptionResult]:
+        """Retorna la transcripción en memoria o en disco si existe y no expiró."""
+        key = (video_id, tuple(languages))
+        with self._memory_cache_lock:
+            cached = self._memory_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        result = self._read_cached_file(video_id, languages)
+        if result is not None:
+            with self._memory_cache_lock:
+                self._memory_cache[key] = result
+        return result
+    
+    def _read_cached_file(self, video_id: str, languages: List[str]) -> Optional[TranscriptionResult]:
+        """Retorna la transcripción guardada en disco si existe y no expiró."""
+        path = self._cache_path(video_id, languages)
+        try:
+            if time.time() - path.stat().st_mtime > TRANSCRIPT_CACHE_TTL:
+                path.unlink(missing_ok=True)
+                return None
+            data = orjson.loads(path.read_bytes())
+            return TranscriptionResult(
+                text=data['text'],
+                segments=[TranscriptionSegment(**seg) for seg in data['segments']],
+                language=data['language'],
+                duration=data['duration']
+            )
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️ Caché de transcripción inválida ({path.name}): {e}")
+            return None
+    
+    def _write_cached(self, video_id: str, languages: List[str], result: TranscriptionResult) -> None:
+        """Guarda la transcripción en memoria y en disco (escritura atómica)."""
+        with self._memory_cache_lock:
+            self._memory_cache[(video_id, tuple(languages))] = result
+        
+        path = self._cache_path(video_id, languages)
+        tmp_path = path.with_suffix(f'.{os.getpid()}-{threading.get_ident()}.tmp')
+        try:
+            tmp_path.write_bytes(orjson.dumps(result))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"⚠️ No se pudo guardar la transcripción en caché: {e}")
+        
+        # Las entradas expiradas solo se borran al releerlas: barrer de vez en cuando,
+        # en un hilo aparte para no recorrer el directorio dentro de la request
+        now = time.monotonic()
+        if now - self._last_cache_sweep > TRANSCRIPT_CACHE_SWEEP_INTERVAL:
+            self._last_cache_sweep = now
+            threading.Thread(target=self.cleanup_disk_cache, name='transcript-cache-sweep', daemon=True).start()
+    
+    def cleanup_disk_cache(self) -> int:
+        """
+        Borra de la caché en disco las transcripciones expiradas (y temporales huérfanos)
+        y, si aún supera TRANSCRIPT_CACHE_MAX_BYTES, las más antiguas.
+        Retorna la cantidad de archivos eliminados.
+        """
+        now = time.time()
+        cutoff = now - TRANSCRIPT_CACHE_TTL
+        kept = []  # (mtime, tamaño, ruta) de las entradas vigentes
+        deleted_count = 0
+        
+        try:
+            with os.scandir(TRANSCRIPT_CACHE_DIR) as entries:
+                for entry in entries:
+                    try:
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        stat = entry.stat()
+                        if entry.name.endswith('.json'):
+                            if stat.st_mtime >= cutoff:
+                                kept.append((stat.st_mtime, stat.st_size, entry.path))
+                                continue
+                        elif stat.st_mtime >= now - 3600:
+                            continue  # .tmp de una escritura que puede seguir en curso
+                        os.unlink(entry.path)
+                        deleted_count += 1
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.warning(f"⚠️ No se pudo barrer la caché de transcripciones: {e}")
+            return deleted_count
+        
+        total = sum(size for _, size, _ in kept)
+        if total > TRANSCRIPT_CACHE_MAX_BYTES:
+            kept.sort()
+            for _, size, path in kept:
+                if total <= TRANSCRIPT_CACHE_MAX_BYTES:
+                    break
                 try:
-                    os.remove(f)
-                except:
+                    os.unlink(path)
+                    deleted_count += 1
+                except OSError:
                     pass
-
+                total -= size
+        
+        if deleted_count:
+            logger.info(f"🗑️ Caché de transcripciones: {deleted_count} archivos eliminados")
+        return deleted_count
+    
+    def _fetch_first_available(self, url: str, video_id: str, languages: List[str]) -> Optional[TranscriptionResult]:
+        """
+        Ejecuta youtube_transcript_api y yt-dlp en paralelo y retorna el primer resultado.
+        Si la API falla tras varios segundos de red, yt-dlp ya va por la mitad.
+        """
+        futures = {
+            _parallel_executor.submit(self._fetch_with_transcript_api, video_id, languages): 'API',
+            _parallel_executor.submit(self._fetch_with_ytdlp, url, video_id, languages): 'yt-dlp',
+        }
+        try:
+            for future in as_completed(futures):
+                result = future.result()
+                if result:
+                    logger.info(f"✅ Transcripción obtenida via {futures[future]}: {result.language}")
+                    return result
+            return None
+        finally:
+            # No esperar al método más lento: termina en segundo plano (o no empieza si
+            # aún estaba en cola)
+            for future in futures:
+                future.cancel()
+    
     def get_transcript(
         self, 
         url: str, 
-        languages: List[str] = None
+        languages: List[str] = None,
+        parsed: Optional[ParsedYtUrl] = None,
+        parallel: Optional[bool] = None
     ) -> Optional[TranscriptionResult]:
         """
         Obtiene la transcripción de un video de YouTube.
@@ -447,6 +768,9 @@ class YoutubeTranscriptService:
         Args:
             url: URL del video de YouTube
             languages: Lista de idiomas preferidos (default: ['es', 'en'])
+            parsed: URL ya analizada, para no volver a extraer el video ID
+            parallel: Lanzar ambos métodos a la vez y quedarse con el primero que
+                responda (None = TRANSCRIPT_PARALLEL_FETCH)
         
         Returns:
             TranscriptionResult o None si no hay transcripción
@@ -456,17 +780,31 @@ class YoutubeTranscriptService:
             languages = ['es', 'en', 'es-419', 'en-US']
         
         # Extraer video ID
-        video_id = self.extract_video_id(url)
+        video_id = parsed.video_id if parsed else self.extract_video_id(url)
         if not video_id:
             logger.warning(f"❌ No se pudo extraer video ID de: {url}")
             return None
         
         logger.info(f"🎬 Buscando transcripción para: {video_id}")
         
+        result = self._read_cached(video_id, languages)
+        if result:
+            logger.info(f"⚡ Transcripción desde caché: {video_id}")
+            return result
+        
+        if PARALLEL_FETCH if parallel is None else parallel:
+            result = self._fetch_first_available(url, video_id, languages)
+            if result:
+                self._write_cached(video_id, languages, result)
+                return result
+            logger.warning(f"❌ No se pudo obtener transcripción nativa para: {video_id}")
+            return None
+        
         # === Método 1: youtube_transcript_api ===
         result = self._fetch_with_transcript_api(video_id, languages)
         if result:
             logger.info(f"✅ Transcripción obtenida via API: {result.language}")
+            self._write_cached(video_id, languages, result)
             return result
         
         # === Método 2: yt-dlp fallback ===
@@ -474,6 +812,7 @@ class YoutubeTranscriptService:
         result = self._fetch_with_ytdlp(url, video_id, languages)
         if result:
             logger.info(f"✅ Transcripción obtenida via yt-dlp: {result.language}")
+            self._write_cached(video_id, languages, result)
             return result
         
         logger.warning(f"❌ No se pudo obtener transcripción nativa para: {video_id}")
@@ -481,11 +820,9 @@ class YoutubeTranscriptService:
 
 
 # Singleton para uso global
-_instance = None
+# Instancia única por proceso, creada al importar (el constructor no hace I/O de red)
+_instance = YoutubeTranscriptService()
 
 def get_transcript_service() -> YoutubeTranscriptService:
     """Obtiene instancia singleton del servicio."""
-    global _instance
-    if _instance is None:
-        _instance = YoutubeTranscriptService()
     return _instance
@@ -0,0 +1,117 @@
+"""
+YouTube URL parsing
+Validación de URLs y extracción del video ID, sin dependencias pesadas:
+la importan tanto el downloader como el servicio de transcripciones (que así no carga yt-dlp).
+"""
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+from urllib.parse import urlsplit
+
+try:
+    import hyperscan
+except ImportError:  # Opcional: no hay wheels para todas las plataformas (ej: Windows)
+    hyperscan = None
+
+logger = logging.getLogger(__name__)
+
+
+# Prefijos de URL de video aceptados
+_YT_URL_PATTERNS = (
+    r'youtube\.com/watch',
+    r'youtu\.be/',
+    r'youtube\.com/shorts/',
+    r'youtube\.com/live/',
+)
+
+# Compiladas una sola vez: se evalúan en cada request
+_YT_URL_RE = re.compile('|'.join(_YT_URL_PATTERNS), re.IGNORECASE)
+_VIDEO_ID_RE = re.compile(
+    r'(?:v=|/)([0-9A-Za-z_-]{11})(?:[?&]|$)'
+    r'|(?:youtu\.be/|embed/|shorts/|live/)([0-9A-Za-z_-]{11})'
+)
+_BARE_VIDEO_ID_RE = re.compile(r'[0-9A-Za-z_-]{11}')
+
+
+def _build_hyperscan_db():
+    """Compila todos los patrones en un único DFA de Hyperscan (None si no está disponible)."""
+    if hyperscan is None:
+        return None
+    try:
+        db = hyperscan.Database()
+        db.compile(
+            expressions=[p.encode() for p in _YT_URL_PATTERNS],
+            ids=list(range(len(_YT_URL_PATTERNS))),
+            elements=len(_YT_URL_PATTERNS),
+            flags=hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH,
+        )
+        return db
+    except Exception as e:
+        logger.warning(f"Hyperscan no disponible, usando regex: {e}")
+        return None
+
+
+_YT_URL_DB = _build_hyperscan_db()
+# El scratch de Hyperscan no se puede compartir entre hilos
+_hs_local = threading.local()
+
+
+def _is_youtube_url(url: str) -> bool:
+    """Valida que la URL sea de un video de YouTube."""
+    if _YT_URL_DB is None:
+        return _YT_URL_RE.search(url) is not None
+    
+    scratch = getattr(_hs_local, 'scratch', None)
+    if scratch is None:
+        scratch = _hs_local.scratch = hyperscan.Scratch(_YT_URL_DB)
+    
+    matched = []
+    _YT_URL_DB.scan(
+        url.encode(),
+        # Retornar un valor verdadero aborta con ScanTerminated: con SINGLEMATCH
+        # cada patrón avisa como mucho una vez, así que se deja terminar el escaneo
+        match_event_handler=lambda *_: matched.append(True),
+        scratch=scratch,
+    )
+    return bool(matched)
+
+
+def _extract_video_id(url: str) -> Optional[str]:
+    """Extrae el ID del video de una URL de YouTube."""
+    if not url:
+        return None
+    
+    match = _VIDEO_ID_RE.search(url)
+    if match:
+        return match.group(1) or match.group(2)
+    
+    if _BARE_VIDEO_ID_RE.fullmatch(url):
+        return url
+    
+    return None
+
+
+@dataclass(frozen=True)
+class ParsedYtUrl:
+    """
+    URL de YouTube analizada una sola vez por request.
+    Se pasa a los servicios para que no vuelvan a parsear la misma URL.
+    """
+    url: str
+    host: str
+    video_id: Optional[str]
+    is_valid: bool
+    
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def parse(url: str) -> 'ParsedYtUrl':
+        """Analiza la URL (resultado cacheado por URL)."""
+        return ParsedYtUrl(
+            url=url,
+            host=(urlsplit(url).hostname or '').lower(),
+            video_id=_extract_video_id(url),
+            is_valid=_is_youtube_url(url),
+        )
@@ -0,0 +1,78 @@
+"""Liberación del hueco de transcripción en respuestas NDJSON de Whisper."""
+import asyncio
+
+import orjson
+import pytest
+
+from app import main
+
+
+@pytest.fixture
+def fake_whisper_path(monkeypatch, tmp_path):
+    """Sin transcripción nativa: descarga un audio falso y 'transcribe' con un generador falso."""
+    audio = tmp_path / 'audio.opus'
+    started = []
+    
+    def download_audio(url, parsed=None):
+        audio.write_bytes(b'audio')
+        return {'file_path': str(audio), 'video_info': {'id': 'dQw4w9WgXcQ'}}
+    
+    def whisper_stream(audio_path, language, include_timestamps, video_info, start_time):
+        started.append(True)
+        yield main._ndjson_line('result', {'text': 'hola'})
+    
+    monkeypatch.setattr(main.youtube_transcript_service, 'get_transcript', lambda *a, **k: None)
+    monkeypatch.setattr(main.youtube_downloader, 'download_audio', download_audio)
+    monkeypatch.setattr(main, '_ndjson_whisper_stream', whisper_stream)
+    monkeypatch.setattr(main, '_inflight', asyncio.Semaphore(main.MAX_INFLIGHT))
+    return audio, started
+
+
+async def _call(disconnect_early: bool):
+    """Ejecuta POST /transcribe con Accept NDJSON sobre ASGI 2.3 (camino con task group)."""
+    body = orjson.dumps({'url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'})
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0', 'spec_version': '2.3'},
+        'http_version': '1.1', 'method': 'POST', 'scheme': 'http', 'path': '/transcribe',
+        'raw_path': b'/transcribe', 'query_string': b'', 'root_path': '',
+        'headers': [(b'content-type', b'application/json'), (b'accept', b'application/x-ndjson')],
+        'client': ('test', 1), 'server': ('test', 80),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    body_done = asyncio.Event()
+    sent = []
+    
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        if not disconnect_early:
+            await body_done.wait()
+        return {'type': 'http.disconnect'}
+    
+    async def send(message):
+        sent.append(message)
+        # Como un socket real: enviar las cabeceras cede el event loop, así la
+        # desconexión cancela la respuesta antes de que empiece a iterar el body
+        await asyncio.sleep(0)
+        if message['type'] == 'http.response.body' and not message.get('more_body'):
+            body_done.set()
+    
+    await main.app(scope, receive, send)
+    return sent
+
+
+def test_slot_released_when_client_disconnects_before_body(fake_whisper_path):
+    audio, started = fake_whisper_path
+    asyncio.run(_call(disconnect_early=True))
+    assert not started
+    assert main._inflight._value == main.MAX_INFLIGHT
+    assert not audio.exists()
+
+
+def test_slot_released_once_after_full_stream(fake_whisper_path):
+    audio, started = fake_whisper_path
+    sent = asyncio.run(_call(disconnect_early=False))
+    assert started
+    assert b'hola' in b''.join(m.get('body', b'') for m in sent)
+    assert main._inflight._value == main.MAX_INFLIGHT
+    assert not audio.exists()
@@ -0,0 +1,51 @@
+"""Caché en disco de transcripciones: barrido de expiradas y límite de tamaño."""
+import os
+import time
+
+import pytest
+
+from app.services import youtube_transcript_service as service_module
+from app.services.youtube_transcript_service import YoutubeTranscriptService
+
+DAY = 86400
+
+
+@pytest.fixture
+def cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(service_module, 'TRANSCRIPT_CACHE_DIR', tmp_path)
+    monkeypatch.setattr(service_module, 'TRANSCRIPT_CACHE_TTL', 7 * DAY)
+    monkeypatch.setattr(service_module, 'TRANSCRIPT_CACHE_MAX_BYTES', 1024 * 1024)
+    return tmp_path
+
+
+def _make(directory, name, age_seconds, size=10):
+    path = directory / name
+    path.write_bytes(b'x' * size)
+    mtime = time.time() - age_seconds
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_sweep_removes_expired_entries_and_stale_tmp(cache_dir):
+    _make(cache_dir, 'viejo-000000000000.json', 8 * DAY)
+    _make(cache_dir, 'nuevo-000000000000.json', 1 * DAY)
+    _make(cache_dir, 'huerfano.1-2.tmp', 2 * 3600)
+    _make(cache_dir, 'en-curso.1-2.tmp', 10)
+    (cache_dir / 'subdir').mkdir()
+    
+    assert YoutubeTranscriptService().cleanup_disk_cache() == 2
+    assert sorted(os.listdir(cache_dir)) == ['en-curso.1-2.tmp', 'nuevo-000000000000.json', 'subdir']
+
+
+def test_sweep_evicts_oldest_over_size_limit(cache_dir, monkeypatch):
+    monkeypatch.setattr(service_module, 'TRANSCRIPT_CACHE_MAX_BYTES', 250)
+    for i, age in enumerate([5 * DAY, 3 * DAY, 2 * DAY, 1 * DAY]):
+        _make(cache_dir, f'v{i}-000000000000.json', age, size=100)
+    
+    assert YoutubeTranscriptService().cleanup_disk_cache() == 2
+    assert sorted(os.listdir(cache_dir)) == ['v2-000000000000.json', 'v3-000000000000.json']
+
+
+def test_sweep_on_missing_directory(cache_dir, monkeypatch):
+    monkeypatch.setattr(service_module, 'TRANSCRIPT_CACHE_DIR', cache_dir / 'no-existe')
+    assert YoutubeTranscriptService().cleanup_disk_cache() == 0
@@ -0,0 +1,97 @@
+"""Parser VTT de youtube_transcript_service."""
+import pytest
+
+from app.services.youtube_transcript_service import (
+    YoutubeTranscriptService,
+    _scan_vtt,
+    _strip_vtt_tags,
+)
+
+
+@pytest.mark.parametrize('line, expected', [
+    ('sin tags', 'sin tags'),
+    ('hola <c.colorE5E5E5>mundo</c>', 'hola mundo'),
+    ('uno<00:00:01.000><c> dos</c>', 'uno dos'),
+    ('a <> b <c>x</c>', 'a <> b x'),
+    ('a <<x> b', 'a  b'),
+    ('3 < 4', '3 < 4'),
+    ('<> y >', '<> y >'),
+    ('abierto <c sin cerrar', 'abierto <c sin cerrar'),
+])
+def test_strip_vtt_tags(line, expected):
+    assert _strip_vtt_tags(line) == expected
+    assert _strip_vtt_tags(line.encode()) == expected.encode()
+
+
+VTT = """WEBVTT
+Kind: captions
+Language: es
+
+00:00:00.000 --> 00:00:02.000 align:start position:0%
+hola <c.colorE5E5E5>mundo</c>  ñandú
+
+00:00:02.000 --> 00:00:03.000
+&nbsp;
+
+00:00:03.000 --> 00:00:04.500
+adiós
+fin
+
+00:04.500 --> 00:05.000
+hola mundo ñandú
+"""
+
+
+@pytest.mark.parametrize('content', [VTT, VTT.encode(), VTT.replace('\n', '\r\n').encode()])
+def test_scan_vtt(content):
+    assert _scan_vtt(content) == [
+        (0.0, 2.0, 'hola mundo ñandú'),
+        (3.0, 4.5, 'adiós fin'),
+        (4.5, 5.0, 'hola mundo ñandú'),
+    ]
+
+
+def test_scan_vtt_strips_inline_timestamps():
+    content = "WEBVTT\n\n00:00:00.000 --> 00:00:02.000\nHello 00:00:01.500 world\n"
+    assert _scan_vtt(content) == [(0.0, 2.0, 'Hello world')]
+    assert _scan_vtt(content.encode()) == [(0.0, 2.0, 'Hello world')]
+
+
+KARAOKE_VTT = """WEBVTT
+Kind: captions
+Language: en
+
+00:00:00.320 --> 00:00:02.750 align:start position:0%
+ 
+so<00:00:00.640><c> today</c><00:00:00.960><c> we're</c><00:00:01.280><c> going</c>
+
+00:00:02.750 --> 00:00:02.760 align:start position:0%
+so today we're going
+ 
+
+00:00:02.760 --> 00:00:05.110 align:start position:0%
+so today we're going
+to<00:00:03.000><c> talk</c> 3 <> 4 about 00:00:04.000 time
+
+NOTE esto no es un cue
+
+1
+00:05.110 --> 00:06.000
+&nbsp;
+fin\u00a0del  video
+"""
+
+
+@pytest.mark.parametrize('content', [VTT, KARAOKE_VTT, 'a <> b <c>x</c>', ''])
+def test_scanner_matches_regex_parser(content):
+    service = YoutubeTranscriptService()
+    expected = service._scan_vtt_regex(content)
+    assert _scan_vtt(content) == expected
+    assert _scan_vtt(content.encode()) == expected
+
+
+def test_parse_vtt_content_drops_repeated_cues():
+    result = YoutubeTranscriptService()._parse_vtt_content(VTT.encode(), 'es')
+    assert [seg.text for seg in result.segments] == ['hola mundo ñandú', 'adiós fin']
+    assert result.text == 'hola mundo ñandú adiós fin'
+    assert result.duration == 4.5
@@ -0,0 +1,150 @@
+"""WhisperTranscriber con un modelo falso (sin cargar faster-whisper)."""
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import whisper_transcriber
+from app.services.whisper_transcriber import WhisperTranscriber
+
+
+class FakeModel:
+    """Imita WhisperModel.transcribe: (generador de segmentos, info)."""
+    
+    def __init__(self, texts, error_after=None):
+        self.texts = texts
+        self.error_after = error_after
+        self.consumed = 0
+    
+    def transcribe(self, audio, **options):
+        def segments():
+            for i, text in enumerate(self.texts):
+                if self.error_after is not None and i == self.error_after:
+                    raise ValueError('decoder roto')
+                self.consumed += 1
+                yield SimpleNamespace(start=float(i), end=i + 1.0, text=f' {text} ')
+        
+        return segments(), SimpleNamespace(language=options.get('language') or 'es', duration=float(len(self.texts)))
+
+
+@pytest.fixture
+def make_transcriber(monkeypatch):
+    """Transcriptor en CPU cuyo _get_loaded retorna el modelo falso (sin pipeline por lotes)."""
+    def make(model, model_name='small'):
+        transcriber = WhisperTranscriber(model_name=model_name, device='cpu', compute_type='int8')
+        loaded = []
+        
+        def get_loaded(name):
+            loaded.append(name)
+            return model, None
+        
+        monkeypatch.setattr(transcriber, '_get_loaded', get_loaded)
+        transcriber.loaded_names = loaded
+        return transcriber
+    return make
+
+
+@pytest.mark.parametrize('language, expected', [
+    ('en', whisper_transcriber.AUTO_MODEL_ENGLISH),
+    ('es', whisper_transcriber.AUTO_MODEL_FALLBACK),
+])
+def test_auto_reports_resolved_model(make_transcriber, language, expected):
+    transcriber = make_transcriber(FakeModel(['hola']), model_name='auto')
+    
+    # Cualquier archivo existente sirve como "audio": el modelo falso no lo lee
+    _segments, _info, model_name = transcriber.iter_segments(__file__, language=language)
+    assert model_name == expected
+    
+    result = transcriber.transcribe(__file__, language=language)
+    assert result.model_name == expected
+    assert result.text == 'hola'
+
+
+def test_shared_model_survives_unload_of_other_holder(monkeypatch):
+    """/model/load crea el nuevo transcriptor antes de descargar el anterior: si comparten
+    pesos ('small' y 'auto' -> 'small'), el registro no debe olvidar el modelo en uso."""
+    import faster_whisper
+    
+    created = []
+    
+    class FakeWhisperModel:
+        def __init__(self, model_id, **kwargs):
+            created.append(model_id)
+    
+    monkeypatch.setattr(faster_whisper, 'WhisperModel', FakeWhisperModel)
+    monkeypatch.setattr(whisper_transcriber, '_bundled_model_path', lambda name: None)
+    monkeypatch.setattr(whisper_transcriber, 'AUTO_MODEL_FALLBACK', 'small')
+    monkeypatch.setattr(whisper_transcriber, '_shared_models', {})
+    
+    def make(name):
+        transcriber = WhisperTranscriber(model_name=name, device='cpu', compute_type='int8')
+        transcriber.batch_size = 1
+        transcriber._load_model()
+        return transcriber
+    
+    old = make('small')
+    new = make('auto')
+    assert created == ['small']
+    
+    old.unload_model()
+    key = ('small', 'cpu', 'int8')
+    assert whisper_transcriber._shared_models[key][0] is new._model
+    
+    again = make('small')
+    assert again._model is new._model
+    assert created == ['small']
+    
+    new.unload_model()
+    again.unload_model()
+    assert key not in whisper_transcriber._shared_models
+
+
+def _run_stream(transcriber, stop_after=None):
+    """Consume transcribe_stream; con `stop_after` el consumidor se va tras n segmentos."""
+    async def consume():
+        texts = []
+        stream = transcriber.transcribe_stream(__file__)
+        try:
+            async for seg in stream:
+                texts.append(seg.text)
+                if stop_after is not None and len(texts) >= stop_after:
+                    break
+        finally:
+            await stream.aclose()
+        return texts
+    
+    return asyncio.run(consume())
+
+
+def _wait_stream_threads(timeout=5.0):
+    """Espera a que terminen los hilos productores de transcribe_stream."""
+    deadline = time.monotonic() + timeout
+    for thread in threading.enumerate():
+        if thread.name == 'whisper-stream':
+            thread.join(max(0.0, deadline - time.monotonic()))
+            assert not thread.is_alive()
+
+
+def test_transcribe_stream_yields_all_segments(make_transcriber):
+    texts = [f'frase {i}' for i in range(5)]
+    assert _run_stream(make_transcriber(FakeModel(texts))) == texts
+    _wait_stream_threads()
+
+
+def test_transcribe_stream_propagates_producer_error(make_transcriber):
+    transcriber = make_transcriber(FakeModel(['uno', 'dos', 'tres'], error_after=2))
+    with pytest.raises(RuntimeError, match='decoder roto'):
+        _run_stream(transcriber)
+    _wait_stream_threads()
+
+
+def test_transcribe_stream_stops_producer_when_consumer_leaves(make_transcriber):
+    total = whisper_transcriber.STREAM_MAX_PENDING * 4
+    model = FakeModel([f'frase {i}' for i in range(total)])
+    
+    assert _run_stream(make_transcriber(model), stop_after=3) == ['frase 0', 'frase 1', 'frase 2']
+    _wait_stream_threads()
+    # La cola acotada frena al productor: no decodifica el audio entero para nadie
+    assert model.consumed < total
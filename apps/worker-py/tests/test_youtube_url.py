@@ -0,0 +1,42 @@
+"""Validación de URLs de YouTube (regex y rama opcional de Hyperscan)."""
+import pytest
+
+from app.services import youtube_url
+from app.services.youtube_url import ParsedYtUrl, _YT_URL_RE, _is_youtube_url
+
+VALID_URLS = [
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+    'https://youtu.be/dQw4w9WgXcQ',
+    'https://www.youtube.com/shorts/dQw4w9WgXcQ',
+    'https://www.youtube.com/live/dQw4w9WgXcQ?feature=share',
+    'HTTPS://WWW.YOUTUBE.COM/WATCH?v=dQw4w9WgXcQ',
+]
+INVALID_URLS = [
+    'https://example.com/watch?v=dQw4w9WgXcQ',
+    'https://vimeo.com/123456',
+    '',
+]
+
+
+@pytest.mark.parametrize('url', VALID_URLS)
+def test_regex_accepts_youtube_urls(url):
+    assert _YT_URL_RE.search(url) is not None
+
+
+@pytest.mark.parametrize('url', INVALID_URLS)
+def test_regex_rejects_other_urls(url):
+    assert _YT_URL_RE.search(url) is None
+
+
+@pytest.mark.parametrize('url', VALID_URLS + INVALID_URLS)
+def test_hyperscan_matches_regex(url):
+    pytest.importorskip('hyperscan')
+    assert youtube_url._YT_URL_DB is not None
+    assert _is_youtube_url(url) == (_YT_URL_RE.search(url) is not None)
+
+
+def test_parse_valid_url():
+    parsed = ParsedYtUrl.parse('https://www.youtube.com/watch?v=dQw4w9WgXcQ')
+    assert parsed.is_valid
+    assert parsed.video_id == 'dQw4w9WgXcQ'
+    assert parsed.host == 'www.youtube.com'